@@ -0,0 +1,55 @@
+""" stress test: customer codes from parallel worker processes never collide
+
+    python benchmarks/code_allocator_stress.py --customers 2000000 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from array import array
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import create_engine
+from app import CodeSequence
+from code_allocator import CodeAllocator, permute
+
+
+def allocate(args):
+    """ one worker process drawing count codes, returns the raw permuted values """
+    url, count, block_size = args
+    allocator = CodeAllocator(create_engine(url), CodeSequence, key='stress', block_size=block_size)
+    values = array('Q', (permute(allocator.next_value(), allocator.key) for _ in range(count)))
+    return values.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--block-size', type=int, default=1000)
+    parser.add_argument('--db', help='database URL, defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    url = args.db or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'codes.db')}"
+    CodeSequence.__table__.create(create_engine(url), checkfirst=True)
+
+    per_worker = args.customers // args.workers
+    started = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.map(allocate, [(url, per_worker, args.block_size)] * args.workers)
+    elapsed = time.perf_counter() - started
+
+    values = array('Q')
+    for result in results:
+        values.frombytes(result)
+    total = len(values)
+    unique = len(set(values))
+    print(f"{total} codes from {args.workers} workers in {elapsed:.2f}s "
+          f"({total / elapsed:,.0f} codes/s), {total - unique} collisions")
+    sys.exit(0 if unique == total else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+""" load test: a customer/order traffic mix against the app in-process or under gunicorn
+
+The database is a scratch SQLite file seeded through the bulk APIs, the SMS
+gateway is stubbed (orders only queue outbox rows; ``--dispatch`` drains them
+with a fake gateway while the load runs). Reports p50/p95/p99 latency and
+requests/sec per route, ``--save`` writes them as JSON and ``--baseline``
+compares against a saved run, exiting 1 on a regression.
+
+    python benchmarks/load_test.py --target inprocess --requests 5000 --concurrency 8 --save base.json
+    python benchmarks/load_test.py --target gunicorn --workers 4 --baseline base.json
+    python benchmarks/load_test.py --replay traffic.jsonl
+
+A replay file has one request per line: {"method": "GET", "path": "/customers/1"}
+with an optional "json" body and "route" name.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+from pagination import encode_cursor
+
+# route: relative weight in the generated mix, reads dominate like the real API
+MIX = {
+    'POST /customers': 5,
+    'POST /orders': 20,
+    'GET /customers/<id>': 35,
+    'GET /customers': 10,
+    'GET /customers/<id>/orders': 30,
+}
+SEED_CUSTOMERS = 1000
+SEED_ORDERS_PER_CUSTOMER = 20
+ID_SEGMENT = re.compile(r'/\d+')
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        route, _, weight = part.rpartition('=')
+        if route not in MIX:
+            raise SystemExit(f"Unknown route {route!r} in --mix, expected one of {', '.join(MIX)}")
+        mix[route] = float(weight)
+    return mix
+
+
+def generate(mix, count, customers, seed):
+    """ ``count`` requests drawn from the weighted route mix """
+    rng = random.Random(seed)
+    routes, weights = zip(*mix.items())
+    for n, route in enumerate(rng.choices(routes, weights, k=count)):
+        customer_id = rng.randint(1, customers)
+        if route == 'POST /customers':
+            body = {'name': f'Load Customer {n}', 'phone_number': f'+2547{n % 10 ** 8:08d}'}
+            yield route, 'POST', '/customers', body
+        elif route == 'POST /orders':
+            body = {'customer_id': customer_id, 'item': rng.choice(('Laptop', 'Phone', 'Cable')),
+                    'amount': round(rng.uniform(1, 2000), 2)}
+            yield route, 'POST', '/orders', body
+        elif route == 'GET /customers/<id>':
+            yield route, 'GET', f'/customers/{customer_id}', None
+        elif route == 'GET /customers':
+            after = rng.randint(0, customers)
+            # the first page most of the time, like a dashboard, otherwise a deep page
+            yield route, 'GET', '/customers' if rng.random() < 0.7 else f'/customers?limit=50&cursor={encode_cursor(after)}', None
+        else:
+            yield route, 'GET', f'/customers/{customer_id}/orders?limit=20', None
+
+
+def replay(path):
+    """ requests read from a JSONL traffic file """
+    with open(path) as lines:
+        for line in lines:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            method = entry.get('method', 'GET').upper()
+            route = entry.get('route') or f"{method} {ID_SEGMENT.sub('/<id>', entry['path'].split('?')[0])}"
+            yield route, method, entry['path'], entry.get('json')
+
+
+class InProcessClient:
+    """ one Flask test client per thread """
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        data = json.dumps(body) if body is not None else None
+        return client.open(path, method=method, data=data, content_type='application/json').status_code
+
+
+class HTTPClient:
+    """ one keep-alive HTTP connection per thread """
+
+    def __init__(self, port):
+        self.port = port
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        data = json.dumps(body) if body is not None else None
+        try:
+            connection.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self.local.connection = None
+            raise
+
+
+def run(client, requests, concurrency):
+    """ send every request from ``concurrency`` threads, returns samples and wall time """
+    samples = {}
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def worker():
+        local = []
+        while True:
+            i = next(counter)
+            if i >= len(requests):
+                break
+            route, method, path, body = requests[i]
+            started = time.perf_counter()
+            try:
+                ok = client.request(method, path, body) < 400
+            except Exception:
+                ok = False
+            local.append((route, time.perf_counter() - started, ok))
+        with lock:
+            for route, latency, ok in local:
+                samples.setdefault(route, []).append((latency, ok))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(samples, elapsed):
+    """ per-route and total latency percentiles (ms), throughput and error counts """
+    def stats(entries):
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        return {
+            'count': len(entries),
+            'errors': sum(not ok for _, ok in entries),
+            'rps': round(len(entries) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+        }
+    routes = {route: stats(entries) for route, entries in sorted(samples.items())}
+    routes['total'] = stats([entry for entries in samples.values() for entry in entries])
+    return routes
+
+
+def regressions(current, baseline, tolerance):
+    """ routes whose tail latency grew or throughput dropped by more than ``tolerance`` """
+    found = []
+    for route, base in baseline['routes'].items():
+        now = current['routes'].get(route)
+        if now is None or base['count'] < 100:
+            # too few samples for a stable p99
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if now[metric] > base[metric] * (1 + tolerance):
+                found.append(f"{route}: {metric} {base[metric]} -> {now[metric]}")
+        if now['rps'] < base['rps'] * (1 - tolerance):
+            found.append(f"{route}: rps {base['rps']} -> {now['rps']}")
+        if now['errors'] > base['errors']:
+            found.append(f"{route}: errors {base['errors']} -> {now['errors']}")
+    return found
+
+
+def seed(app, customers, orders_per_customer):
+    """ fresh schema plus customers (ids 1..n) and order history, loaded through the bulk APIs """
+    from app import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    client = app.test_client()
+    body = '\n'.join(json.dumps({'name': f'Customer {i}', 'phone_number': f'+2547{i:08d}'})
+                     for i in range(1, customers + 1))
+    client.post('/customers/bulk', data=body, content_type='application/x-ndjson')
+    start = datetime(2024, 1, 1)
+    body = '\n'.join(
+        json.dumps({'customer_id': c, 'item': 'Seed', 'amount': 10.0 + n,
+                    'time': (start + timedelta(hours=c + n * 24)).isoformat()})
+        for c in range(1, customers + 1) for n in range(orders_per_customer))
+    client.post('/orders/bulk', data=body, content_type='application/x-ndjson')
+
+
+def stub_gateway(latency):
+    """ Africa's Talking stand-in accepting every number after ``latency`` seconds """
+    def send(message, recipients):
+        time.sleep(latency)
+        return {'SMSMessageData': {'Recipients': [{'number': number, 'statusCode': 101} for number in recipients]}}
+    return send
+
+
+@contextmanager
+def dispatching(app, latency):
+    from app import SMSOutbox, db
+    from sms_dispatcher import SMSDispatcher
+    with app.app_context():
+        dispatcher = SMSDispatcher(db.engine, SMSOutbox, stub_gateway(latency), poll_interval=0.05)
+    dispatcher.start()
+    try:
+        yield dispatcher
+    finally:
+        dispatcher.stop()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn(env, workers, threads, log):
+    """ gunicorn serving create_app() until the block exits """
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+         '-b', f'127.0.0.1:{port}', 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=log, stderr=log)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise SystemExit(f"gunicorn did not start, see {log.name}")
+                time.sleep(0.1)
+        yield port
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def report(result):
+    print(f"{'route':<30}{'count':>7}{'errors':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<30}{stats['count']:>7}{stats['errors']:>7}{stats['rps']:>9.1f}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=('inprocess', 'gunicorn'), default='inprocess')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--warmup', type=int, default=200, help='requests sent first and not measured')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--mix', type=parse_mix, default=MIX, help='e.g. "GET /customers/<id>=9,POST /orders=1"')
+    parser.add_argument('--replay', help='JSONL traffic file to send instead of the generated mix')
+    parser.add_argument('--customers', type=int, default=SEED_CUSTOMERS)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--dispatch', action='store_true', help='drain the SMS outbox with a stub gateway meanwhile')
+    parser.add_argument('--sms-latency', type=float, default=0.05, help='stub gateway seconds per send')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against, exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.update(
+        APP_CONFIG='sqlite', SESSION_BACKEND='cookie', CACHE_BACKEND='memory',
+        SQLITE_DATABASE_URL=f"sqlite:///{os.path.join(directory, 'load.db')}",
+        AT_USERNAME='sandbox', AT_API_KEY='stub', API_AUTH_REQUIRED='false', CUSTOMER_CODE_KEY='load-test',
+    )
+    from app import create_app
+    app = create_app()
+    seed(app, args.customers, SEED_ORDERS_PER_CUSTOMER)
+
+    if args.replay:
+        requests = list(replay(args.replay))
+        warmup = []
+    else:
+        requests = list(generate(args.mix, args.requests, args.customers, args.seed))
+        warmup = list(generate(args.mix, args.warmup, args.customers, args.seed + 1))
+
+    with open(os.path.join(directory, 'server.log'), 'w') as log, \
+            (dispatching(app, args.sms_latency) if args.dispatch else nullcontext()):
+        if args.target == 'gunicorn':
+            with gunicorn(dict(os.environ), args.workers, args.threads, log) as port:
+                client = HTTPClient(port)
+                run(client, warmup, args.concurrency)
+                samples, elapsed = run(client, requests, args.concurrency)
+        else:
+            client = InProcessClient(app)
+            run(client, warmup, args.concurrency)
+            samples, elapsed = run(client, requests, args.concurrency)
+
+    result = {
+        'meta': {
+            'target': args.target, 'requests': len(requests), 'concurrency': args.concurrency,
+            'workers': args.workers if args.target == 'gunicorn' else None, 'replay': args.replay,
+            'mix': None if args.replay else args.mix, 'seed': args.seed, 'dispatch': args.dispatch,
+            'elapsed_s': round(elapsed, 3), 'python': platform.python_version(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+        },
+        'routes': summarize(samples, elapsed),
+    }
+    report(result)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('target', 'concurrency', 'workers', 'mix', 'replay'):
+            if baseline['meta'].get(key) != result['meta'][key]:
+                print(f"warning: baseline {key} was {baseline['meta'].get(key)!r}, now {result['meta'][key]!r}")
+        found = regressions(result, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+""" /orders/export: time to first byte, throughput and peak memory against the row count
+
+    python benchmarks/order_export_bench.py --orders 200000 500000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.update(APP_CONFIG='sqlite', API_AUTH_REQUIRED='false')
+
+
+def seed(app, db, Customer, Order, count):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(db.insert(Customer), [
+            {'name': f'Customer {i}', 'code': f'BENCH{i:07d}', 'phone_number': f'+2547{i:08d}'} for i in range(1, 1001)
+        ])
+        start = datetime(2024, 1, 1)
+        for offset in range(0, count, 50000):
+            db.session.execute(db.insert(Order), [
+                {'customer_id': n % 1000 + 1, 'item': f'Item {n % 97}', 'amount': n % 500 + 0.25,
+                 'time': start + timedelta(seconds=n)}
+                for n in range(offset, min(count, offset + 50000))
+            ])
+        db.session.commit()
+
+
+def stream(client, path, headers):
+    started = time.perf_counter()
+    response = client.get(path, headers=headers)
+    first = None
+    size = 0
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    return first, time.perf_counter() - started, size
+
+
+def export(client, path, headers):
+    """ stream one export, returns (first byte s, total s, bytes, peak traced MiB) """
+    first, elapsed, size = stream(client, path, headers)
+    # tracing slows Python down several times, so memory is measured in a second pass
+    tracemalloc.start()
+    stream(client, path, headers)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return first, elapsed, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, nargs='+', default=[100000, 300000])
+    args = parser.parse_args()
+
+    os.environ['SQLITE_DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'export.db')}"
+    from app import app, db, Customer, Order
+    client = app.test_client()
+
+    print(f"{'orders':>9}  {'export':<12}{'first ms':>9}{'total s':>9}{'rows/s':>10}{'MiB out':>9}{'peak MiB':>9}")
+    for count in args.orders:
+        seed(app, db, Customer, Order, count)
+        for name, path, headers in (
+            ('csv', '/orders/export', {}),
+            ('csv+gzip', '/orders/export', {'Accept-Encoding': 'gzip'}),
+            ('ndjson+gzip', '/orders/export?format=ndjson', {'Accept-Encoding': 'gzip'}),
+        ):
+            first, elapsed, size, peak = export(client, path, headers)
+            print(f"{count:>9}  {name:<12}{first * 1000:>9.1f}{elapsed:>9.2f}{count / elapsed:>10.0f}"
+                  f"{size / 2 ** 20:>9.1f}{peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
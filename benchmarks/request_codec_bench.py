@@ -0,0 +1,61 @@
+""" per-request parse/serialize cost: the previous json path against msgspec
+
+    python benchmarks/request_codec_bench.py --iterations 100000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from flask import Flask, jsonify
+from schemas import OrderCreated, OrderIn, decode, encode
+
+BODY = json.dumps({'customer_id': 12345, 'item': 'Product Test', 'amount': 150.75}).encode()
+
+app = Flask(__name__)
+
+
+def previous_parse():
+    """ what request.json and the hand-rolled checks did, no type checking at all """
+    data = json.loads(BODY)
+    if not data.get('customer_id') or not data.get('item'):
+        raise ValueError('Missing required fields')
+    return data['customer_id'], data['item'], data['amount']
+
+
+def msgspec_parse():
+    return decode(BODY, OrderIn)
+
+
+def previous_serialize():
+    return jsonify({'message': 'Order added', 'order_id': 1})
+
+
+def msgspec_serialize():
+    return app.response_class(encode(OrderCreated('Order added', 1)), status=201, mimetype='application/json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    def cost(function):
+        return min(timeit.repeat(function, number=args.iterations, repeat=5)) / args.iterations * 1e6
+
+    with app.app_context():
+        rows = [
+            ('parse + validate', cost(previous_parse), cost(msgspec_parse)),
+            ('serialize response', cost(previous_serialize), cost(msgspec_serialize)),
+        ]
+    rows.append(('total', sum(row[1] for row in rows), sum(row[2] for row in rows)))
+
+    print(f"{'us/request':<20}{'json':>10}{'msgspec':>10}{'speedup':>10}")
+    for name, previous, current in rows:
+        print(f"{name:<20}{previous:>10.2f}{current:>10.2f}{previous / current:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
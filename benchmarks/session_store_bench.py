@@ -0,0 +1,101 @@
+""" session read/write latency with many live sessions, per backend
+
+    python benchmarks/session_store_bench.py --sessions 100000
+    python benchmarks/session_store_bench.py --backends redis  # against SESSION_REDIS_URL
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from flask import Flask
+from session_store import init_sessions
+
+LIFETIME = timedelta(hours=1)
+
+
+def session_data(i):
+    # roughly what /callback stores: the parsed ID token
+    return {'user': {'sub': f'auth0|{i:024d}', 'email': f'user{i}@example.com', 'name': f'User {i}',
+                     'nickname': f'user{i}', 'iat': 1700000000, 'exp': 1700036000}}
+
+
+def make_app(backend, directory, threshold):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='bench', SESSION_BACKEND=backend, SESSION_PERMANENT=False,
+        SESSION_FILE_DIR=os.path.join(directory, 'flask_session'), SESSION_FILE_THRESHOLD=threshold,
+        SESSION_DB_URL=f"sqlite:///{os.path.join(directory, 'sessions.db')}",
+        SESSION_REDIS_URL=os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0'),
+    )
+    init_sessions(app)
+    return app
+
+
+def server_side(app):
+    interface = app.session_interface
+
+    def write(i):
+        interface._upsert_session(LIFETIME, interface.session_class(session_data(i), sid=str(i)), f'session:{i}')
+
+    def read(i):
+        return interface._retrieve_session_data(f'session:{i}')
+    return write, read
+
+
+def cookie(app):
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = {}
+
+    def write(i):
+        cookies[i % 1000] = serializer.dumps(session_data(i))
+
+    def read(i):
+        return serializer.loads(cookies[i % 1000])
+    return write, read
+
+
+def timed(operation, keys):
+    samples = []
+    for key in keys:
+        started = time.perf_counter()
+        operation(key)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=100000, help='live sessions to load first')
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--backends', default='filesystem,filesystem-unbounded,db,cookie')
+    args = parser.parse_args()
+
+    print(f"{'backend':<24}{'live':>9}{'load s':>9}{'write p50':>11}{'p99':>9}{'read p50':>10}{'p99':>9}  (us)")
+    for name in args.backends.split(','):
+        directory = tempfile.mkdtemp()
+        # "filesystem" is the current store: FileSystemCache capped at 500 sessions
+        threshold = args.sessions + args.samples if name == 'filesystem-unbounded' else 500
+        app = make_app(name.split('-')[0], directory, threshold)
+        write, read = cookie(app) if name == 'cookie' else server_side(app)
+
+        started = time.perf_counter()
+        for i in range(args.sessions):
+            write(i)
+        loaded = time.perf_counter() - started
+
+        keys = random.sample(range(args.sessions), min(args.samples, args.sessions))
+        write_p50, write_p99 = timed(write, [args.sessions + i for i in range(args.samples)])
+        read_p50, read_p99 = timed(read, keys)
+        live = sum(read(key) is not None for key in keys) * args.sessions // len(keys)
+        print(f"{name:<24}{live:>9}{loaded:>9.1f}{write_p50:>11.0f}{write_p99:>9.0f}{read_p50:>10.0f}{read_p99:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
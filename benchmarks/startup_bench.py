@@ -0,0 +1,72 @@
+""" cold start of a worker: importing the app and serving its first requests
+
+Each run is a fresh interpreter, like a gunicorn worker booting, using the
+SQLite profile against a scratch database.
+
+    python benchmarks/startup_bench.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SETUP = """
+from app import app, db
+with app.app_context():
+    db.create_all()
+"""
+
+RUN = """
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+client.get('/customers/1')
+first = time.perf_counter()
+client.post('/customers', json={'name': 'Cold Start', 'phone_number': '+254700000000'})
+written = time.perf_counter()
+client.get('/customers/1')
+warm = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first read': first - imported,
+    'first write': written - first,
+    'warm read': warm - written,
+    'modules': len(sys.modules),
+}))
+"""
+
+
+def run(code, env):
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(result.stderr)
+    return result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    env = dict(os.environ, APP_CONFIG='sqlite', SESSION_BACKEND='cookie', CACHE_BACKEND='memory', CUSTOMER_CODE_KEY='bench',
+               SQLITE_DATABASE_URL=f"sqlite:///{os.path.join(directory, 'startup.db')}")
+    run(SETUP, env)
+
+    samples = [json.loads(run(RUN, env)) for _ in range(args.runs)]
+    print(f"{'phase':<14}{'p50 ms':>9}{'max ms':>9}")
+    for phase in ('import', 'first read', 'first write', 'warm read'):
+        values = [sample[phase] * 1000 for sample in samples]
+        print(f"{phase:<14}{statistics.median(values):>9.1f}{max(values):>9.1f}")
+    print(f"modules loaded: {samples[0]['modules']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+""" streaming parsing and chunking for the bulk ingestion endpoints """
+import json
+from datetime import datetime
+from itertools import chain, islice
+
+from schemas import BulkOrderIn, CustomerIn, convert
+
+
+READ_SIZE = 64 * 1024
+MAX_ROW_SIZE = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+class BulkFormatError(ValueError):
+    """ the body is not NDJSON or a JSON array """
+
+
+def _chunks(stream):
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            return
+        yield data
+
+
+def _text(stream):
+    """ decode a binary stream to text chunks, keeping split UTF-8 sequences intact """
+    pending = b''
+    for data in _chunks(stream):
+        data = pending + data
+        try:
+            yield data.decode('utf-8')
+            pending = b''
+        except UnicodeDecodeError as e:
+            if e.start < len(data) - 3:
+                raise BulkFormatError("Body is not valid UTF-8") from e
+            yield data[:e.start].decode('utf-8')
+            pending = data[e.start:]
+    if pending:
+        raise BulkFormatError("Body is not valid UTF-8")
+
+
+def _ndjson(first, chunks):
+    buffer = ''
+    for chunk in chain([first], chunks):
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line
+        if len(buffer) > MAX_ROW_SIZE:
+            raise BulkFormatError(f"Row is larger than {MAX_ROW_SIZE} bytes")
+    yield buffer
+
+
+def _array(first, chunks):
+    """ yield the elements of a top level JSON array without loading all of it """
+    buffer, pos = first, 1  # skip the opening bracket
+    expect_value = True
+    chunks = iter(chunks)
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if len(buffer) - pos > MAX_ROW_SIZE:
+            raise BulkFormatError(f"Row is larger than {MAX_ROW_SIZE} bytes")
+        if pos == len(buffer):
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise BulkFormatError("Unterminated JSON array")
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if buffer[pos] == ']':
+            return
+        if not expect_value:
+            if buffer[pos] != ',':
+                raise BulkFormatError("Expected ',' between array elements")
+            pos += 1
+            expect_value = True
+            continue
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # element may be cut off at the end of the buffer, read more
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise BulkFormatError("Invalid JSON array element")
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if end == len(buffer):
+            # a number at the end of the buffer may continue in the next chunk
+            chunk = next(chunks, None)
+            if chunk is not None:
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+        yield value
+        pos = end
+        expect_value = False
+
+
+def iter_records(stream):
+    """ yield (row number, record or error) for every row of an NDJSON or JSON array body
+
+    A body that cannot be read any further yields a final BulkFormatError.
+    """
+    number = 0
+    try:
+        chunks = _text(stream)
+        first = ''
+        for chunk in chunks:
+            first += chunk
+            if first.strip():
+                break
+        first = first.lstrip()
+        if not first:
+            return
+
+        if first[0] == '[':
+            for value in _array(first, chunks):
+                number += 1
+                yield number, value
+            return
+
+        for line in _ndjson(first, chunks):
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, BulkFormatError("Invalid JSON")
+    except BulkFormatError as e:
+        yield number + 1, e
+
+
+def batched(iterable, size):
+    """ split an iterable into lists of at most size items """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def validate_customer(record):
+    """ clean a customer row or raise ValueError """
+    return convert(record, CustomerIn)
+
+
+def validate_order(record):
+    """ clean an order row or raise ValueError, an order without a time is stamped on arrival
+
+    Times are cut to whole seconds: MySQL 5.7 rounds a fractional DATETIME on insert, which
+    would store 09:59:59.6 as 10:00:00 while the rollups counted it in the 09:00 hour.
+    """
+    row = convert(record, BulkOrderIn)
+    row['time'] = (row['time'] or datetime.now()).replace(microsecond=0)
+    return row
+
+
+class BulkReport:
+    """ running totals and per-row errors for one bulk upload """
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def as_dict(self):
+        return {
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
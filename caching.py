@@ -0,0 +1,164 @@
+""" cache backends, hit/miss counters and versioned keys on top of Flask-Caching """
+import threading
+import uuid
+from collections import OrderedDict
+from time import monotonic
+
+from flask_caching.backends.base import BaseCache
+
+
+# CACHE_BACKEND values and the Flask-Caching CACHE_TYPE they select
+BACKENDS = {
+    'memory': 'caching.LRUCache',
+    'filesystem': 'FileSystemCache',
+    'redis': 'RedisCache',
+    'null': 'NullCache',
+}
+
+
+class LRUCache(BaseCache):
+    """ thread safe in-process cache evicting the least recently used key
+
+    :param threshold: maximum number of keys kept.
+    :param default_timeout: seconds a key lives when set without a timeout,
+                            0 keeps it until it is evicted.
+    """
+
+    def __init__(self, threshold=10000, default_timeout=300):
+        BaseCache.__init__(self, default_timeout=default_timeout)
+        self._threshold = threshold
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(threshold=config['CACHE_THRESHOLD'], default_timeout=config['CACHE_DEFAULT_TIMEOUT'])
+        return cls(*args, **kwargs)
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return monotonic() + timeout if timeout else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._cache[key] = (self._expires(timeout), value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._threshold:
+                self._cache.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            if key in self._cache:
+                expires = self._cache[key][0]
+                if expires is None or expires > monotonic():
+                    return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._cache.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+        return True
+
+    def inc(self, key, delta=1):
+        with self._lock:
+            expires, value = self._cache.get(key, (None, 0))
+            value = (value or 0) + delta
+            self._cache[key] = (expires, value)
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
+
+
+class CacheStats:
+    """ process local hit/miss counters """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidated(self, keys=1):
+        with self._lock:
+            self.invalidations += keys
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CacheLayer:
+    """ get-or-build lookups and versioned namespaces over a Flask-Caching cache
+
+    A namespace (e.g. one customer's order pages) gets a random version token
+    that is part of every key in it; invalidating the namespace replaces the
+    token so every old key becomes unreachable at once. A lost token (evicted
+    or expired) behaves the same way, so a stale entry is never served.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.stats = CacheStats()
+
+    def get_or_build(self, key, build, timeout=None):
+        """ cached value of key, calling build on a miss; None results are not cached """
+        value = self.cache.get(key)
+        self.stats.count(value is not None)
+        if value is None:
+            value = build()
+            if value is not None:
+                self.cache.set(key, value, timeout=timeout)
+        return value
+
+    def version(self, namespace):
+        token = self.cache.get(f'version:{namespace}')
+        if token is None:
+            token = uuid.uuid4().hex
+            if not self.cache.add(f'version:{namespace}', token, timeout=0):
+                token = self.cache.get(f'version:{namespace}') or token
+        return token
+
+    def versioned_key(self, namespace, *parts):
+        return ':'.join([namespace, self.version(namespace), *map(str, parts)])
+
+    def invalidate(self, keys=(), namespaces=()):
+        for key in keys:
+            self.cache.delete(key)
+        for namespace in namespaces:
+            self.cache.set(f'version:{namespace}', uuid.uuid4().hex, timeout=0)
+        self.stats.invalidated(len(keys) + len(namespaces))
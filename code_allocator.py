@@ -0,0 +1,103 @@
+""" unique, non-guessable customer codes handed out from DB-reserved blocks """
+import hashlib
+import os
+import threading
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+
+# Crockford base32, no I, L, O or U so codes are easy to read out over the phone
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CODE_LENGTH = 8
+CODE_BITS = 5 * CODE_LENGTH
+HALF_BITS = CODE_BITS // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 8
+
+
+class CodeSpaceExhausted(RuntimeError):
+    """ every value of the code space has been handed out """
+
+
+def permute(value, key, rounds=ROUNDS):
+    """ keyed bijection on CODE_BITS bit integers (a balanced Feistel network)
+
+    Sequential sequence values map to codes that look random without the key,
+    while distinct values always give distinct codes.
+    """
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for i in range(rounds):
+        digest = hashlib.blake2b(right.to_bytes(4, 'big'), digest_size=4, key=key, salt=i.to_bytes(16, 'big')).digest()
+        left, right = right, left ^ (int.from_bytes(digest, 'big') & HALF_MASK)
+    return (left << HALF_BITS) | right
+
+
+def encode(value):
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def is_legacy_code(code, prefix='CUST'):
+    """ codes from the old random.randint generator, CUST plus five digits """
+    return len(code) == len(prefix) + 5 and code.startswith(prefix) and code[len(prefix):].isdigit()
+
+
+class CodeAllocator:
+    """ hands out customer codes from blocks of a DB-backed sequence
+
+    Each process reserves ``block_size`` sequence values at a time with a single
+    UPDATE on the sequence row, then allocates from the block in memory, so a
+    customer insert needs no extra round trip. Values are unique across every
+    worker sharing the database and are scrambled by a keyed permutation.
+    Legacy codes are 5 digits long and can never clash with the 8 character
+    codes issued here.
+    """
+
+    def __init__(self, engine, model, key, block_size=1000, name='customer_code', prefix='CUST'):
+        self.engine = engine
+        self.model = model
+        self.key = hashlib.blake2b(key.encode() if isinstance(key, str) else key, digest_size=32).digest()
+        self.block_size = block_size
+        self.name = name
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = None
+
+    def reserve(self, size):
+        """ reserve size sequence values, returns the first one """
+        model = self.model
+        for _ in range(2):
+            with self.engine.begin() as conn:
+                updated = conn.execute(
+                    update(model).where(model.name == self.name).values(next_value=model.next_value + size)
+                ).rowcount
+                if updated:
+                    end = conn.scalar(select(model.next_value).where(model.name == self.name))
+                    return end - size
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(model.__table__.insert().values(name=self.name, next_value=0))
+            except IntegrityError:
+                pass  # another worker created the row first
+        raise RuntimeError(f"Could not reserve values from sequence {self.name!r}")
+
+    def next_value(self):
+        with self._lock:
+            # a block reserved before a fork must not be shared with the child
+            if self._next >= self._end or self._pid != os.getpid():
+                self._next = self.reserve(self.block_size)
+                self._end = self._next + self.block_size
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+        if value >> CODE_BITS:
+            raise CodeSpaceExhausted(f"Sequence {self.name!r} is past the end of the code space")
+        return value
+
+    def next_code(self):
+        return self.prefix + encode(permute(self.next_value(), self.key))
@@ -0,0 +1,125 @@
+""" configuration profiles for create_app, picked by APP_CONFIG (mysql or sqlite) """
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import URL, make_url
+
+from caching import BACKENDS
+
+
+# load environment variables
+load_dotenv()
+
+
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    """ settings shared by every profile """
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cookie')
+    SESSION_FILE_DIR = './flask_session'
+    SESSION_FILE_THRESHOLD = 500
+    SESSION_DB_URL = os.getenv('SESSION_DB_URL', 'sqlite:///sessions.db')
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    SESSION_CLEANUP_N_REQUESTS = int(os.getenv('SESSION_CLEANUP_N_REQUESTS', 0)) or None
+    SESSION_PERMANENT = False
+
+    # Auth0, authlib reads the AUTH0_* keys when the client is first used
+    AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
+    AUTH0_CALLBACK_URL = os.getenv('AUTH0_CALLBACK_URL')
+    AUTH0_CLIENT_ID = os.getenv('AUTH0_CLIENT_ID')
+    AUTH0_CLIENT_SECRET = os.getenv('AUTH0_CLIENT_SECRET')
+    AUTH0_API_BASE_URL = f'https://{AUTH0_DOMAIN}'
+    AUTH0_ACCESS_TOKEN_URL = f'https://{AUTH0_DOMAIN}/oauth/token'
+    AUTH0_AUTHORIZE_URL = f'https://{AUTH0_DOMAIN}/authorize'
+    AUTH0_SERVER_METADATA_URL = f'https://{AUTH0_DOMAIN}/.well-known/openid-configuration'
+    AUTH0_CLIENT_KWARGS = {'scope': 'openid profile email'}
+
+    # bearer tokens for the API, verified locally against the Auth0 JWKS
+    AUTH0_AUDIENCE = os.getenv('AUTH0_AUDIENCE')
+    API_AUTH_REQUIRED = env_flag('API_AUTH_REQUIRED', bool(AUTH0_AUDIENCE))
+    AUTH0_JWKS_REFRESH_INTERVAL = int(os.getenv('AUTH0_JWKS_REFRESH_INTERVAL', 3600))
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 1024))
+
+    # Africa's Talking, initialized on the first SMS sent
+    AT_USERNAME = os.getenv('AT_USERNAME')
+    AT_API_KEY = os.getenv('AT_API_KEY')
+
+    SMS_SENDER_ID = '20267'
+    SMS_DISPATCH_WORKERS = int(os.getenv('SMS_DISPATCH_WORKERS', 4))
+    SMS_DISPATCH_BATCH_SIZE = int(os.getenv('SMS_DISPATCH_BATCH_SIZE', 200))
+    SMS_MAX_ATTEMPTS = int(os.getenv('SMS_MAX_ATTEMPTS', 5))
+
+    BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+    # keys the customer code permutation: required, secret, and never changed once codes exist,
+    # a new key permutes differently and new codes could then collide with old ones
+    CUSTOMER_CODE_KEY = os.getenv('CUSTOMER_CODE_KEY')
+    CUSTOMER_CODE_BLOCK_SIZE = int(os.getenv('CUSTOMER_CODE_BLOCK_SIZE', 1000))
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 5000))
+    EXPORT_GZIP_LEVEL = int(os.getenv('EXPORT_GZIP_LEVEL', 6))
+
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_TYPE = BACKENDS[CACHE_BACKEND]
+    # the memory backend is per process, a write only invalidates the worker that made it,
+    # so with several workers its entries must expire quickly; use redis to invalidate everywhere
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 30 if CACHE_BACKEND == 'memory' else 300))
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', 10000))
+    CACHE_DIR = os.getenv('CACHE_DIR', './flask_cache')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # request/SQL/SMS metrics at /metrics, requests slower than METRICS_SLOW_REQUEST_MS are logged with their queries
+    METRICS_ENABLED = env_flag('METRICS_ENABLED', True)
+    METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 0))
+
+
+class MySQLConfig(Config):
+    """ production database, one pool per worker process sized from the environment """
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or URL.create(
+        'mysql+pymysql',
+        username=os.getenv('DB_USERNAME', 'flask_user'),
+        password=os.getenv('DB_PASSWORD', 'PasswordHere1234.'),
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'customer_order'),
+    ).render_as_string(hide_password=False)
+    # keep pool_size + max_overflow times the number of workers under MySQL's max_connections,
+    # and pool_recycle under its wait_timeout so idle connections are replaced before MySQL drops them
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 3600)),
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True),
+    }
+
+
+class SQLiteConfig(Config):
+    """ local development without a MySQL server, a relative path lives in the instance folder """
+    SQLALCHEMY_DATABASE_URI = os.getenv('SQLITE_DATABASE_URL', 'sqlite:///customer_order.db')
+
+
+CONFIGS = {
+    'mysql': MySQLConfig,
+    'sqlite': SQLiteConfig,
+}
+
+
+def load_config(name=None):
+    """ the profile named by ``name`` or APP_CONFIG """
+    name = name or os.getenv('APP_CONFIG', 'mysql')
+    if name not in CONFIGS:
+        raise ValueError(f"Unknown APP_CONFIG {name!r}, expected one of {', '.join(CONFIGS)}")
+    return CONFIGS[name]
+
+
+def profile_for(url):
+    """ the profile to layer overrides naming ``url`` on, SQLite URLs get no MySQL pool options """
+    if url is not None and make_url(url).get_backend_name() == 'sqlite':
+        return 'sqlite'
+    return None
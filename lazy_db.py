@@ -0,0 +1,81 @@
+""" Flask-SQLAlchemy extension that builds each engine on first use """
+import threading
+from collections.abc import Mapping
+from functools import partial
+
+from flask_sqlalchemy import SQLAlchemy
+
+
+class LazyEngines(Mapping):
+    """ engines by bind key, each created by its factory the first time it is looked up """
+
+    def __init__(self, factories):
+        self._factories = factories
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        engine = self._engines.get(key)
+        if engine is None:
+            factory = self._factories[key]
+            with self._lock:
+                engine = self._engines.get(key)
+                if engine is None:
+                    engine = self._engines[key] = factory()
+        return engine
+
+    def __contains__(self, key):
+        # membership must not build the engine, the session asks before every query
+        return key in self._factories
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self):
+        return len(self._factories)
+
+    def built(self):
+        """ the engines created so far """
+        return dict(self._engines)
+
+
+class LazySQLAlchemy(SQLAlchemy):
+    """ ``SQLAlchemy`` whose engines, their pools and DB-API drivers are only created
+    when the first query, ``db.engine`` or ``db.create_all()`` needs them """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._engine_hooks = []
+
+    def on_engine(self, hook):
+        """ call ``hook(engine, app)`` for every engine as it is built """
+        self._engine_hooks.append(hook)
+        return hook
+
+    def init_app(self, app):
+        previous = self._app_engines.pop(app, None)
+        if previous is not None:
+            for engine in previous.built().values():
+                engine.dispose()
+        # Flask-SQLAlchemy would add the query recording listeners to the engine factories,
+        # build() adds them to each engine once it exists
+        record_queries = app.config.get('SQLALCHEMY_RECORD_QUERIES', False)
+        app.config['SQLALCHEMY_RECORD_QUERIES'] = False
+        try:
+            super().init_app(app)
+        finally:
+            app.config['SQLALCHEMY_RECORD_QUERIES'] = record_queries
+        self._app_engines[app] = LazyEngines(self._app_engines[app])
+
+    def _make_engine(self, bind_key, options, app):
+        make = partial(super()._make_engine, bind_key, options, app)
+
+        def build():
+            engine = make()
+            if app.config['SQLALCHEMY_RECORD_QUERIES']:
+                from flask_sqlalchemy import record_queries
+                record_queries._listen(engine)
+            for hook in self._engine_hooks:
+                hook(engine, app)
+            return engine
+        return build
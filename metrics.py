@@ -0,0 +1,278 @@
+""" request, SQL, connection pool and SMS instrumentation in Prometheus text format
+
+Metrics are kept per process, like the cache stats: each gunicorn worker and
+the SMS dispatcher expose their own and Prometheus sums them across targets.
+Recording is a lock and a few additions per observation, cheap enough to
+leave on in production.
+"""
+import logging
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from flask import request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MAX_LOGGED_QUERIES = 50
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """ monotonically increasing count per label combination """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}_total{_labels(self.labels, labels)} {_number(value)}'
+
+
+class Histogram:
+    """ observations counted into cumulative ``le`` buckets per label combination """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, *labels):
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def total(self, *labels):
+        entry = self._values.get(labels)
+        return entry[1] if entry else 0.0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == '+Inf' else f'le="{_number(float(bound))}"'
+                yield f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {cumulative}'
+
+
+class Registry:
+    """ the metrics of this process, rendered in the Prometheus text format """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    'http_requests', 'HTTP requests handled.', ('method', 'route', 'status')))
+http_request_duration = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ('method', 'route')))
+http_request_queries = REGISTRY.register(Histogram(
+    'http_request_sql_queries', 'SQL statements issued per HTTP request.', ('method', 'route'), COUNT_BUCKETS))
+http_request_sql_duration = REGISTRY.register(Histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL per HTTP request.', ('method', 'route')))
+sql_query_duration = REGISTRY.register(Histogram(
+    'sql_query_duration_seconds', 'SQL statement execution time.', (), QUERY_BUCKETS))
+pool_checkout_wait = REGISTRY.register(Histogram(
+    'db_pool_checkout_wait_seconds', 'Time waiting for a pooled connection, including opening new ones.',
+    (), QUERY_BUCKETS))
+sms_send_duration = REGISTRY.register(Histogram(
+    'sms_send_duration_seconds', 'SMS gateway call latency.'))
+sms_recipients = REGISTRY.register(Counter(
+    'sms_recipients', 'SMS recipients by gateway outcome: accepted, rejected, unreported or error.', ('outcome',)))
+sms_send_failures = REGISTRY.register(Counter(
+    'sms_send_failures', 'SMS gateway calls that raised an error.'))
+
+
+# SQL accounting for the request being handled on this thread
+_current = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context._metrics_started
+    sql_query_duration.observe(elapsed)
+    current = getattr(_current, 'request', None)
+    if current is not None:
+        current[0] += 1
+        current[1] += elapsed
+        statements = current[2]
+        if statements is not None and len(statements) < MAX_LOGGED_QUERIES:
+            statements.append((elapsed, statement))
+
+
+def _time_pool_checkout(engine):
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_checkout_wait.observe(perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(engine, app):
+    """ time every statement and pool checkout of an engine, see LazySQLAlchemy.on_engine """
+    if not app.config['METRICS_ENABLED']:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    _time_pool_checkout(engine)
+    # dispose() swaps in a fresh pool
+    event.listen(engine, 'engine_disposed', _time_pool_checkout)
+
+
+def timed_send(send):
+    """ wrap an SMS gateway call to record its latency and outcome per recipient """
+    from sms_dispatcher import recipient_statuses
+
+    def wrapper(message, recipients):
+        started = perf_counter()
+        try:
+            response = send(message, recipients)
+        except Exception:
+            sms_send_failures.inc()
+            sms_recipients.inc('error', amount=len(recipients))
+            raise
+        finally:
+            sms_send_duration.observe(perf_counter() - started)
+        statuses = recipient_statuses(response, recipients)
+        sms_recipients.inc('accepted', amount=statuses.count(True))
+        sms_recipients.inc('rejected', amount=statuses.count(False))
+        sms_recipients.inc('unreported', amount=statuses.count(None))
+        return response
+    return wrapper
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def init_app(app):
+    """ record every request and serve the metrics at /metrics """
+    if not app.config['METRICS_ENABLED']:
+        return
+    slow_after = (app.config.get('METRICS_SLOW_REQUEST_MS') or 0) / 1000
+
+    @app.before_request
+    def start_timer():
+        _current.request = [0, 0.0, [] if slow_after else None, perf_counter()]
+
+    def finish(status):
+        current = getattr(_current, 'request', None)
+        if current is None:
+            return
+        _current.request = None
+        queries, sql_time, statements, started = current
+        elapsed = perf_counter() - started
+        method, route = request.method, _route()
+        http_requests.inc(method, route, status)
+        http_request_duration.observe(elapsed, method, route)
+        http_request_queries.observe(queries, method, route)
+        http_request_sql_duration.observe(sql_time, method, route)
+        if slow_after and elapsed >= slow_after:
+            lines = ''.join(f'\n  {seconds * 1000:8.2f} ms  {statement}' for seconds, statement in statements)
+            logger.warning("Slow request %s %s %d took %.1f ms, %d queries in %.1f ms%s",
+                           method, request.full_path.rstrip('?'), status, elapsed * 1000,
+                           queries, sql_time * 1000, lines)
+
+    @app.after_request
+    def record(response):
+        finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failure(exc):
+        # after_request is skipped when a view raises an unhandled error
+        finish(500)
+
+    @app.route('/metrics')
+    def metrics():
+        return app.response_class(REGISTRY.render(), mimetype=CONTENT_TYPE)
+
+
+def serve(port, host='0.0.0.0'):
+    """ expose /metrics from a process without a Flask server, e.g. the SMS dispatcher """
+    from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+    def application(environ, start_response):
+        start_response('200 OK', [('Content-Type', CONTENT_TYPE)])
+        return [REGISTRY.render().encode()]
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = make_server(host, port, application, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,51 @@
+""" order export as CSV or NDJSON, produced batch by batch and optionally gzip-compressed
+
+Each function takes and returns iterables, so the rows fetched through a
+server-side cursor go out as bytes one batch at a time: memory stays bounded
+by the batch size and the first bytes are sent before the query finishes.
+"""
+import csv
+import io
+import zlib
+
+import msgspec
+
+COLUMNS = ('id', 'customer_id', 'item', 'amount', 'time')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+_encoder = msgspec.json.Encoder()
+
+
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    yield (','.join(COLUMNS) + '\n').encode('utf-8')
+    for rows in batches:
+        writer.writerows((id_, customer_id, item, amount, time.isoformat())
+                         for id_, customer_id, item, amount, time in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_chunks(batches):
+    for rows in batches:
+        yield _encoder.encode_lines([dict(zip(COLUMNS, row)) for row in rows])
+
+
+def export_chunks(batches, fmt):
+    """ encoded chunks of the rows in ``batches``, one chunk per batch """
+    return csv_chunks(batches) if fmt == 'csv' else ndjson_chunks(batches)
+
+
+def gzip_chunks(chunks, level=6):
+    """ gzip the chunks on the fly, flushing after each so the client receives them as they are made """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
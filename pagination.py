@@ -0,0 +1,54 @@
+""" keyset (cursor) pagination helpers for the read APIs """
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(*values):
+    """ opaque cursor holding the sort key of the last row on a page """
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """ sort key from a cursor, converted to the given types, raises ValueError """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [datetime.fromisoformat(value) if kind is datetime else kind(value) for kind, value in zip(types, values)]
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(value, default, maximum):
+    """ page size from the query string, bounded to 1..maximum """
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("Invalid limit")
+    return max(1, min(limit, maximum))
+
+
+def parse_datetime(value, name):
+    """ datetime from the query string, raises ValueError """
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}', expected an ISO 8601 datetime")
+    # order times are stored as naive local time, comparing with the offset dropped would shift the range
+    if parsed.tzinfo is not None:
+        raise ValueError(f"Invalid '{name}', expected a local time without a UTC offset")
+    return parsed
+
+
+def page(rows, limit, key):
+    """ split limit + 1 fetched rows into the page and the cursor of the next page """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,189 @@
+""" order rollups: per-customer totals and daily/hourly revenue kept in step with the orders
+
+Every write path adds its orders' deltas inside its own transaction, so the
+rollups commit or roll back with the orders. Rows are upserted in key order
+(one statement per table) so concurrent transactions take their row locks in
+the same order and never deadlock each other; the current day and hour rows
+are still shared, which is why the upsert is the last statement before commit
+(callers flush their ORM rows first, the Core upsert does not autoflush).
+"""
+from sqlalchemy import case, select, update
+
+GRAINS = ('day', 'hour')
+TOLERANCE = 1e-6
+
+
+def period_start(time, grain):
+    """ start of the day or hour an order time falls in """
+    if grain == 'hour':
+        return time.replace(minute=0, second=0, microsecond=0)
+    return time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def local_time(time):
+    """ ``time`` as a naive local datetime, the way order times are stored """
+    if time.tzinfo is not None:
+        return time.astimezone().replace(tzinfo=None)
+    return time
+
+
+def aggregate(orders):
+    """ per-customer and per-period totals of (customer_id, amount, time) tuples """
+    customers, periods = {}, {}
+    for customer_id, amount, time in orders:
+        # aware and naive datetimes do not compare, nor would their periods
+        time = local_time(time)
+        totals = customers.get(customer_id)
+        if totals is None:
+            customers[customer_id] = [1, amount, time]
+        else:
+            totals[0] += 1
+            totals[1] += amount
+            if time > totals[2]:
+                totals[2] = time
+        for grain in GRAINS:
+            key = (grain, period_start(time, grain))
+            totals = periods.get(key)
+            if totals is None:
+                periods[key] = [1, amount]
+            else:
+                totals[0] += 1
+                totals[1] += amount
+    return customers, periods
+
+
+def _later(existing, incoming):
+    return case((existing.is_(None), incoming), (incoming > existing, incoming), else_=existing)
+
+
+def _increment(session, table, keys, rows, latest=None):
+    """ add ``order_count``/``amount_total`` of each row to its rollup, inserting missing ones """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(rows)
+        incoming = statement.inserted
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(rows)
+        incoming = statement.excluded
+    else:
+        _increment_each(session, table, keys, rows, latest)
+        return
+
+    changes = {
+        'order_count': table.c.order_count + incoming.order_count,
+        'amount_total': table.c.amount_total + incoming.amount_total,
+    }
+    if latest:
+        changes[latest] = _later(table.c[latest], incoming[latest])
+    if dialect == 'mysql':
+        statement = statement.on_duplicate_key_update(**changes)
+    else:
+        statement = statement.on_conflict_do_update(index_elements=list(keys), set_=changes)
+    session.execute(statement)
+
+
+def _increment_each(session, table, keys, rows, latest):
+    """ UPDATE then INSERT per row, for dialects without an upsert """
+    for row in rows:
+        changes = {
+            'order_count': table.c.order_count + row['order_count'],
+            'amount_total': table.c.amount_total + row['amount_total'],
+        }
+        if latest:
+            changes[latest] = _later(table.c[latest], row[latest])
+        condition = [table.c[key] == row[key] for key in keys]
+        if not session.execute(update(table).where(*condition).values(**changes)).rowcount:
+            session.execute(table.insert().values(**row))
+
+
+def _close(a, b):
+    return abs(a - b) <= TOLERANCE * max(1.0, abs(b))
+
+
+class OrderRollups:
+    """ maintains the rollup models from orders given as (customer_id, amount, time) """
+
+    def __init__(self, customer_model, revenue_model):
+        self.customer_model = customer_model
+        self.revenue_model = revenue_model
+
+    @property
+    def tables(self):
+        return [self.customer_model.__table__, self.revenue_model.__table__]
+
+    def apply(self, session, orders):
+        """ add new orders to the rollups in the caller's transaction """
+        customers, periods = aggregate(orders)
+        if customers:
+            _increment(session, self.customer_model.__table__, ('customer_id',), [
+                {'customer_id': customer_id, 'order_count': count, 'amount_total': total, 'last_order_at': last}
+                for customer_id, (count, total, last) in sorted(customers.items())
+            ], latest='last_order_at')
+        if periods:
+            _increment(session, self.revenue_model.__table__, ('grain', 'period_start'), [
+                {'grain': grain, 'period_start': start, 'order_count': count, 'amount_total': total}
+                for (grain, start), (count, total) in sorted(periods.items())
+            ])
+
+    def compute(self, session, order_model, chunk_size=10000):
+        """ rollups recomputed from every order, streamed in chunks """
+        rows = session.execute(
+            select(order_model.customer_id, order_model.amount, order_model.time)
+            .execution_options(yield_per=chunk_size)
+        )
+        return aggregate(tuple(row) for row in rows)
+
+    def rebuild(self, session, order_model):
+        """ replace the rollups with totals recomputed from the orders, returns the row counts """
+        customers, periods = self.compute(session, order_model)
+        for table in self.tables:
+            session.execute(table.delete())
+        if customers:
+            session.execute(self.customer_model.__table__.insert(), [
+                {'customer_id': customer_id, 'order_count': count, 'amount_total': total, 'last_order_at': last}
+                for customer_id, (count, total, last) in sorted(customers.items())
+            ])
+        if periods:
+            session.execute(self.revenue_model.__table__.insert(), [
+                {'grain': grain, 'period_start': start, 'order_count': count, 'amount_total': total}
+                for (grain, start), (count, total) in sorted(periods.items())
+            ])
+        return len(customers), len(periods)
+
+    def verify(self, session, order_model):
+        """ differences between the stored rollups and the orders, empty when they agree """
+        customers, periods = self.compute(session, order_model)
+        problems = []
+
+        customer_model = self.customer_model
+        stored = {
+            row.customer_id: (row.order_count, row.amount_total, row.last_order_at)
+            for row in session.execute(select(
+                customer_model.customer_id, customer_model.order_count,
+                customer_model.amount_total, customer_model.last_order_at))
+        }
+        for customer_id in sorted(set(customers) | set(stored)):
+            expected = customers.get(customer_id, (0, 0.0, None))
+            found = stored.get(customer_id, (0, 0.0, None))
+            if expected[0] != found[0] or not _close(found[1], expected[1]) or expected[2] != found[2]:
+                problems.append(f"customer {customer_id}: expected {tuple(expected)}, stored {found}")
+
+        revenue_model = self.revenue_model
+        stored = {
+            (row.grain, row.period_start): (row.order_count, row.amount_total)
+            for row in session.execute(select(
+                revenue_model.grain, revenue_model.period_start,
+                revenue_model.order_count, revenue_model.amount_total))
+        }
+        for key in sorted(set(periods) | set(stored)):
+            expected = periods.get(key, (0, 0.0))
+            found = stored.get(key, (0, 0.0))
+            if expected[0] != found[0] or not _close(found[1], expected[1]):
+                grain, start = key
+                problems.append(f"{grain} {start.isoformat()}: expected {tuple(expected)}, stored {found}")
+        return problems
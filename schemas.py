@@ -0,0 +1,92 @@
+""" msgspec schemas for the API request and response bodies """
+from datetime import datetime
+from typing import Optional
+
+import msgspec
+from typing_extensions import Annotated  # typing.Annotated needs Python 3.9, CI runs 3.8
+
+
+Name = Annotated[str, msgspec.Meta(min_length=1, max_length=100)]
+PhoneNumber = Annotated[str, msgspec.Meta(min_length=1, max_length=20)]
+Item = Annotated[str, msgspec.Meta(min_length=1, max_length=100)]
+# order times are stored without a zone, in the server's local time like datetime.now()
+NaiveDatetime = Annotated[datetime, msgspec.Meta(tz=False)]
+
+
+class CustomerIn(msgspec.Struct):
+    name: Name
+    phone_number: PhoneNumber
+
+
+class OrderIn(msgspec.Struct):
+    customer_id: int
+    item: Item
+    amount: float
+
+
+class BulkOrderIn(OrderIn):
+    """ historical orders may carry the time they were placed """
+    time: Optional[NaiveDatetime] = None
+
+
+class CustomerCreated(msgspec.Struct):
+    message: str
+    id: int
+    code: str
+
+
+class OrderCreated(msgspec.Struct):
+    message: str
+    order_id: int
+
+
+class Error(msgspec.Struct, omit_defaults=True):
+    error: str
+    detail: Optional[str] = None
+
+
+class RequestError(ValueError):
+    """ a request body that does not match its schema """
+
+    def __init__(self, error):
+        super().__init__(error.detail or error.error)
+        self.error = error
+
+
+_decoders = {}
+encode = msgspec.json.Encoder().encode
+
+
+def missing_fields(data, schema):
+    """ required fields of ``schema`` that a JSON body leaves out, null or empty """
+    try:
+        body = msgspec.json.decode(data)
+    except msgspec.DecodeError:
+        return []
+    if not isinstance(body, dict):
+        return []
+    return [field.encode_name for field in msgspec.structs.fields(schema)
+            if field.required and body.get(field.encode_name) in (None, '')]
+
+
+def decode(data, schema):
+    """ decode and validate raw JSON bytes in one pass, raises RequestError """
+    decoder = _decoders.get(schema)
+    if decoder is None:
+        decoder = _decoders[schema] = msgspec.json.Decoder(schema)
+    try:
+        return decoder.decode(data)
+    except msgspec.ValidationError as e:
+        # only invalid bodies are parsed a second time, to tell a missing field from a wrong one
+        summary = 'Missing required fields' if missing_fields(data, schema) else 'Invalid request body'
+        raise RequestError(Error(summary, str(e)))
+    except msgspec.DecodeError as e:
+        raise RequestError(Error('Invalid JSON', str(e)))
+
+
+def convert(record, schema):
+    """ validate an already parsed JSON value into a plain dict, raises ValueError """
+    try:
+        return msgspec.structs.asdict(msgspec.convert(record, schema))
+    except msgspec.ValidationError as e:
+        raise ValueError(str(e))
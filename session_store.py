@@ -0,0 +1,166 @@
+""" selectable session backends: signed cookie, file store, shared DB or Redis """
+import os
+from datetime import datetime
+
+from cachelib.file import FileSystemCache
+from flask_session import Session
+from flask_session.base import ServerSideSession, ServerSideSessionInterface
+from flask_session.defaults import Defaults
+from sqlalchemy import Column, DateTime, LargeBinary, MetaData, String, Table, create_engine, delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+
+SESSION_BACKENDS = ('cookie', 'filesystem', 'db', 'redis')
+
+metadata = MetaData()
+
+# the expiry index keeps cleanup a range scan however many sessions are live
+sessions_table = Table(
+    'flask_sessions', metadata,
+    Column('session_id', String(255), primary_key=True),
+    Column('data', LargeBinary, nullable=False),
+    Column('expiry', DateTime, nullable=False, index=True),
+)
+
+
+class DBSession(ServerSideSession):
+    pass
+
+
+class DBSessionInterface(ServerSideSessionInterface):
+    """ sessions in a SQL table shared by every worker and host
+
+    Uses its own engine (``SESSION_DB_URL``, SQLite locally, MySQL in
+    production) so saving a session never commits the request's ORM session.
+    Reads filter on ``expiry`` and expired rows are removed in batches by the
+    ``session_cleanup`` command or every ``SESSION_CLEANUP_N_REQUESTS`` requests.
+    """
+
+    session_class = DBSession
+    ttl = False
+    cleanup_batch_size = 1000
+
+    def __init__(self, app, url, key_prefix=Defaults.SESSION_KEY_PREFIX, permanent=Defaults.SESSION_PERMANENT,
+                 sid_length=Defaults.SESSION_ID_LENGTH,
+                 serialization_format=Defaults.SESSION_SERIALIZATION_FORMAT,
+                 cleanup_n_requests=Defaults.SESSION_CLEANUP_N_REQUESTS, engine=None):
+        self.url = url
+        self._engine = engine
+        self._table_ready = False
+        super().__init__(app, key_prefix, False, permanent, sid_length, serialization_format, cleanup_n_requests)
+
+    @property
+    def engine(self):
+        # built on first use, so workers that never touch a session never open a pool
+        if self._engine is None:
+            self._engine = create_engine(self.url, pool_pre_ping=True)
+        return self._engine
+
+    def _connect(self):
+        # the table is created on first use so importing the app never touches the database
+        if not self._table_ready:
+            metadata.create_all(self.engine, checkfirst=True)
+            self._table_ready = True
+        return self.engine.begin()
+
+    def _upsert_statement(self, values):
+        """ single round trip INSERT .. ON CONFLICT/DUPLICATE KEY UPDATE where the dialect has one """
+        changes = {'data': values['data'], 'expiry': values['expiry']}
+        dialect = self.engine.dialect.name
+        # only the dialect in use is imported, the others cost a worker ~50ms at startup
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            return insert(sessions_table).values(**values).on_duplicate_key_update(**changes)
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            return insert(sessions_table).values(**values).on_conflict_do_update(
+                index_elements=['session_id'], set_=changes)
+        return None
+
+    def _retrieve_session_data(self, store_id):
+        with self._connect() as conn:
+            data = conn.scalar(
+                select(sessions_table.c.data)
+                .where(sessions_table.c.session_id == store_id, sessions_table.c.expiry > datetime.utcnow())
+            )
+        return self.serializer.decode(data) if data is not None else None
+
+    def _delete_session(self, store_id):
+        with self._connect() as conn:
+            conn.execute(delete(sessions_table).where(sessions_table.c.session_id == store_id))
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        values = {
+            'session_id': store_id,
+            'data': self.serializer.encode(session),
+            'expiry': datetime.utcnow() + session_lifetime,
+        }
+        statement = self._upsert_statement(values)
+        if statement is not None:
+            with self._connect() as conn:
+                conn.execute(statement)
+            return
+
+        changes = update(sessions_table).where(sessions_table.c.session_id == store_id).values(
+            data=values['data'], expiry=values['expiry'])
+        with self._connect() as conn:
+            if conn.execute(changes).rowcount:
+                return
+        try:
+            with self._connect() as conn:
+                conn.execute(sessions_table.insert().values(**values))
+        except IntegrityError:
+            with self._connect() as conn:
+                conn.execute(changes)
+
+    def _delete_expired_sessions(self):
+        """ delete expired sessions in small batches to keep locks short """
+        now = datetime.utcnow()
+        while True:
+            with self._connect() as conn:
+                expired = conn.scalars(
+                    select(sessions_table.c.session_id)
+                    .where(sessions_table.c.expiry <= now)
+                    .limit(self.cleanup_batch_size)
+                ).all()
+                if expired:
+                    conn.execute(delete(sessions_table).where(sessions_table.c.session_id.in_(expired)))
+            if len(expired) < self.cleanup_batch_size:
+                return
+
+
+def init_sessions(app):
+    """ install the session interface picked by SESSION_BACKEND """
+    backend = app.config['SESSION_BACKEND']
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r}, expected one of {', '.join(SESSION_BACKENDS)}")
+
+    if backend == 'cookie':
+        # Flask's own interface: the session is signed with SECRET_KEY and
+        # itsdangerous zlib-compresses it whenever that makes it shorter
+        return
+
+    if backend == 'db':
+        app.session_interface = DBSessionInterface(
+            app,
+            url=app.config['SESSION_DB_URL'],
+            permanent=app.config['SESSION_PERMANENT'],
+            cleanup_n_requests=app.config.get('SESSION_CLEANUP_N_REQUESTS'),
+        )
+        return
+
+    if backend == 'filesystem':
+        directory = app.config['SESSION_FILE_DIR']
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        app.config['SESSION_TYPE'] = 'cachelib'
+        app.config['SESSION_CACHELIB'] = FileSystemCache(
+            directory, threshold=app.config['SESSION_FILE_THRESHOLD'], default_timeout=3600)
+    else:
+        import redis
+        app.config['SESSION_TYPE'] = 'redis'
+        app.config['SESSION_REDIS'] = redis.Redis.from_url(app.config['SESSION_REDIS_URL'])
+    Session(app)
@@ -0,0 +1,204 @@
+""" background dispatcher draining the SMS outbox """
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# Africa's Talking recipient status codes meaning the message was accepted
+AT_SUCCESS_CODES = {100, 101, 102}
+
+
+def queue_depth(session, model):
+    """ number of outbox messages still waiting to be delivered """
+    return session.scalar(
+        select(func.count()).select_from(model).where(model.status.in_((PENDING, SENDING)))
+    )
+
+
+def _digits(number):
+    return ''.join(c for c in number if c.isdigit()).lstrip('0')
+
+
+def same_number(stored, reported):
+    """ whether the gateway's number is the stored one, e.g. +254712345678 for 0712345678
+
+    The gateway reports numbers in international form, customers may be stored
+    in the local one, so the shorter number must end the longer one.
+    """
+    short, long = sorted((_digits(stored), _digits(reported)), key=len)
+    return len(short) >= 7 and long.endswith(short)
+
+
+def recipient_statuses(response, recipients):
+    """ per recipient, whether the gateway accepted it: True, False, or None if it reported nothing """
+    try:
+        entries = response['SMSMessageData']['Recipients']
+    except (KeyError, TypeError):
+        # no per-recipient breakdown, a response without an exception is a success
+        return [True] * len(recipients)
+    statuses = []
+    for recipient in recipients:
+        status = None
+        for entry in entries:
+            if same_number(recipient, str(entry.get('number', ''))):
+                status = entry.get('statusCode') in AT_SUCCESS_CODES
+                break
+        statuses.append(status)
+    return statuses
+
+
+class SMSDispatcher:
+    """ drains the outbox table, batching identical messages into one send call
+
+    Due rows are claimed by moving them to ``sending`` with a lease; a row whose
+    lease runs out (e.g. the process died mid-send) becomes claimable again.
+    """
+
+    def __init__(self, engine, model, send, workers=4, batch_size=200, max_recipients=100,
+                 max_attempts=5, backoff_base=2.0, backoff_max=300.0, lease=60.0, poll_interval=1.0):
+        self.Session = sessionmaker(bind=engine, expire_on_commit=False)
+        self.model = model
+        self.send = send
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_recipients = max_recipients
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sms-dispatch')
+        self._stop = threading.Event()
+        self._thread = None
+
+    def queue_depth(self):
+        with self.Session() as session:
+            return queue_depth(session, self.model)
+
+    def backoff(self, attempts):
+        """ seconds to wait before the next attempt """
+        return min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+
+    def claim(self):
+        """ lease a batch of due messages to this dispatcher
+
+        Every row is claimed by an UPDATE conditional on the status and
+        next_attempt_at just read, so when dispatchers race for a row only one
+        UPDATE matches it. Unlike SKIP LOCKED this also works on MySQL 5.7.
+        """
+        model = self.model
+        now = datetime.now()
+        lease = now + timedelta(seconds=self.lease)
+        with self.Session() as session, session.begin():
+            due = session.execute(
+                select(model.id, model.phone_number, model.message, model.status, model.next_attempt_at)
+                .where(model.status.in_((PENDING, SENDING)), model.next_attempt_at <= now)
+                .order_by(model.next_attempt_at)
+                .limit(self.batch_size)
+            ).all()
+            claimed = []
+            # in id order, so racing dispatchers lock the rows in the same order
+            for row in sorted(due, key=lambda row: row.id):
+                result = session.execute(
+                    update(model)
+                    .where(model.id == row.id, model.status == row.status,
+                           model.next_attempt_at == row.next_attempt_at)
+                    .values(status=SENDING, next_attempt_at=lease)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    claimed.append(row)
+        return claimed
+
+    def batches(self, rows):
+        """ group rows into (message, rows) batches with unique recipients per batch """
+        by_message = {}
+        for row in rows:
+            chunks = by_message.setdefault(row.message, [])
+            for chunk in chunks:
+                if len(chunk) < self.max_recipients and all(r.phone_number != row.phone_number for r in chunk):
+                    chunk.append(row)
+                    break
+            else:
+                chunks.append([row])
+        return [(message, chunk) for message, chunks in by_message.items() for chunk in chunks]
+
+    def deliver(self, message, rows):
+        """ send one batch and record the outcome of every row in it
+
+        Rejected recipients are retried with backoff. Recipients the gateway
+        reported nothing about are marked failed rather than retried, the
+        message may well have gone out.
+        """
+        recipients = [row.phone_number for row in rows]
+        error = None
+        try:
+            statuses = recipient_statuses(self.send(message, recipients), recipients)
+        except Exception as e:
+            logger.warning("Error sending SMS to %d recipients: %s", len(recipients), e)
+            statuses, error = [False] * len(rows), str(e)
+        outcomes = {row.id: status for row, status in zip(rows, statuses)}
+
+        model = self.model
+        now = datetime.now()
+        with self.Session() as session, session.begin():
+            for row in session.scalars(select(model).where(model.id.in_(list(outcomes)))):
+                status = outcomes[row.id]
+                if status:
+                    row.status = SENT
+                    row.sent_at = now
+                    continue
+                row.attempts += 1
+                if status is None:
+                    row.status = FAILED
+                    row.last_error = 'no status reported by gateway'
+                    continue
+                row.last_error = (error or 'rejected by gateway')[:255]
+                if row.attempts >= self.max_attempts:
+                    row.status = FAILED
+                else:
+                    row.status = PENDING
+                    row.next_attempt_at = now + timedelta(seconds=self.backoff(row.attempts))
+        return sum(1 for status in statuses if status)
+
+    def dispatch_once(self):
+        """ claim and send one batch of due messages, returns the number of rows handled """
+        rows = self.claim()
+        futures = [self._pool.submit(self.deliver, message, chunk) for message, chunk in self.batches(rows)]
+        for future in futures:
+            future.result()
+        return len(rows)
+
+    def run(self):
+        """ keep draining the outbox until stopped """
+        while not self._stop.is_set():
+            try:
+                handled = self.dispatch_once()
+            except Exception:
+                logger.exception("SMS dispatch round failed")
+                handled = 0
+            if not handled:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='sms-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pool.shutdown(wait=True)
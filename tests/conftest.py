@@ -0,0 +1,4 @@
+import os
+
+# the apps under test allocate customer codes, which needs a key
+os.environ.setdefault('CUSTOMER_CODE_KEY', 'test-customer-code-key')
@@ -3,7 +3,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import unittest
 import json
-from app import app, db, Customer, Order
+from app import app, db, Customer, Order, SMSOutbox
 import pytest
 from unittest.mock import patch
 
@@ -77,17 +77,22 @@ class TestAPI(unittest.TestCase):
 
             customer_id = customer.id
 
-            # Mocking the sms.send method to raise an exception
-        with patch('africastalking.SMS.send', side_effect=Exception("SMS sending failed")):
-            response = self.app.post('/orders', json={
-                'customer_id': customer_id,
-                'item': 'Test Item',
-                'amount': 150.75
-            })
-
-            data = json.loads(response.data)
-            self.assertEqual(response.status_code, 201)
-            self.assertIn('Order added', data['message'])
+        # The order only queues the SMS alert, the dispatcher sends it later
+        response = self.app.post('/orders', json={
+            'customer_id': customer_id,
+            'item': 'Test Item',
+            'amount': 150.75
+        })
+
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Order added', data['message'])
+
+        with app.app_context():
+            alert = db.session.scalars(db.select(SMSOutbox)).one()
+            self.assertEqual(alert.phone_number, "+254700000000")
+            self.assertEqual(alert.status, 'pending')
+            self.assertIn('Test Item', alert.message)
 
     def test_add_customer_invalid(self):
         # Missing customer data/empty JSON body
@@ -0,0 +1,138 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import unittest
+from unittest.mock import patch
+from datetime import datetime
+from app import app, db, Customer, Order, RevenueRollup
+from bulk_ingest import BulkFormatError, iter_records
+
+
+def records(body, read_size=7):
+    with patch('bulk_ingest.READ_SIZE', read_size):
+        return list(iter_records(io.BytesIO(body.encode('utf-8'))))
+
+
+class TestIterRecords(unittest.TestCase):
+    rows = [{'name': 'Jöhn', 'n': 12345}, {'name': 'Jane', 'n': [1, 2]}, 7]
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(row, ensure_ascii=False) for row in self.rows) + '\n\n'
+        self.assertEqual(records(body), list(enumerate(self.rows, 1)))
+
+    def test_json_array(self):
+        body = ' [ ' + ' ,\n'.join(json.dumps(row, ensure_ascii=False) for row in self.rows) + ' ] '
+        self.assertEqual(records(body), list(enumerate(self.rows, 1)))
+        self.assertEqual(records('[]'), [])
+
+    def test_invalid_ndjson_line(self):
+        result = records('{"a": 1}\nnot json\n{"b": 2}\n')
+        self.assertEqual(result[0], (1, {'a': 1}))
+        self.assertIsInstance(result[1][1], BulkFormatError)
+        self.assertEqual(result[2], (3, {'b': 2}))
+
+    def test_unterminated_array(self):
+        result = records('[{"a": 1}, {"b"')
+        self.assertEqual(result[0], (1, {'a': 1}))
+        self.assertEqual(result[1][0], 2)
+        self.assertIsInstance(result[1][1], BulkFormatError)
+
+
+class TestBulkAPI(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_bulk_customers(self):
+        body = '\n'.join([
+            json.dumps({'name': 'John Doe', 'phone_number': '+254701234567'}),
+            json.dumps({'name': 'No Phone'}),
+            json.dumps({'name': 'Jane Doe', 'phone_number': '+254701234568'}),
+        ])
+        with patch.dict(app.config, {'BULK_CHUNK_SIZE': 2}):
+            response = self.app.post('/customers/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['inserted'], 2)
+        self.assertEqual(response.json['errors'], [{'row': 2, 'error': "Object missing required field `phone_number`"}])
+
+        with app.app_context():
+            codes = db.session.scalars(db.select(Customer.code)).all()
+        self.assertEqual(len(codes), 2)
+        self.assertTrue(all(codes))
+
+    def test_bulk_orders(self):
+        with app.app_context():
+            customer = Customer(name="Test Customer", phone_number="+254700000000")
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+
+        body = json.dumps([
+            {'customer_id': customer_id, 'item': 'A', 'amount': 10, 'time': '2024-01-02T03:04:05'},
+            {'customer_id': 9999, 'item': 'B', 'amount': 20},
+            {'customer_id': customer_id, 'item': 'C', 'amount': '30'},
+            {'customer_id': customer_id, 'item': 'D', 'amount': 40.5},
+        ])
+        with patch.dict(app.config, {'BULK_CHUNK_SIZE': 3}):
+            response = self.app.post('/orders/bulk', data=body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['inserted'], 2)
+        self.assertEqual(response.json['errors'], [
+            {'row': 3, 'error': "Expected `float`, got `str` - at `$.amount`"},
+            {'row': 2, 'error': 'Customer does not exist'},
+        ])
+
+        with app.app_context():
+            orders = db.session.scalars(db.select(Order).order_by(Order.id)).all()
+        self.assertEqual([order.item for order in orders], ['A', 'D'])
+        self.assertEqual(orders[0].time.year, 2024)
+
+    def test_bulk_order_time_with_offset(self):
+        with app.app_context():
+            customer = Customer(name="Test Customer", phone_number="+254700000000")
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+
+        response = self.app.post('/orders/bulk', json=[
+            {'customer_id': customer_id, 'item': 'A', 'amount': 10, 'time': '2024-01-01T09:15:00'},
+            {'customer_id': customer_id, 'item': 'B', 'amount': 20, 'time': '2024-01-01T10:15:00+03:00'},
+        ])
+        self.assertEqual(response.json['inserted'], 1)
+        self.assertEqual(response.json['errors'][0]['row'], 2)
+        self.assertIn('no timezone', response.json['errors'][0]['error'])
+
+    def test_bulk_order_time_whole_seconds(self):
+        with app.app_context():
+            customer = Customer(name="Test Customer", phone_number="+254700000000")
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+
+        response = self.app.post('/orders/bulk', json=[
+            {'customer_id': customer_id, 'item': 'A', 'amount': 10, 'time': '2024-01-01T09:59:59.600000'},
+        ])
+        self.assertEqual(response.json['inserted'], 1)
+        with app.app_context():
+            self.assertEqual(Order.query.one().time, datetime(2024, 1, 1, 9, 59, 59))
+            hour = RevenueRollup.query.filter_by(grain='hour').one()
+            self.assertEqual(hour.period_start, datetime(2024, 1, 1, 9))
+
+    def test_bulk_invalid_body(self):
+        response = self.app.post('/customers/bulk', data='[{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['inserted'], 0)
+        self.assertEqual(response.json['error_count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
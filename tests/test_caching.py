@@ -0,0 +1,127 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import fakeredis
+from app import app, create_app, db, cache, cache_layer, Customer
+from caching import BACKENDS, LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(threshold=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+    def test_ttl(self):
+        lru = LRUCache(default_timeout=0)
+        lru.set('a', 1, timeout=0.01)
+        lru.set('b', 2)
+        self.assertFalse(lru.add('a', 10))
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('a'))
+        self.assertTrue(lru.add('a', 10))
+        self.assertEqual(lru.get('b'), 2)
+
+
+class TestCacheLayer(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            customer = Customer(name="Test Customer", phone_number="+254700000000")
+            db.session.add(customer)
+            db.session.commit()
+            self.customer_id = customer.id
+        cache.clear()
+        cache_layer.stats.reset()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def stats(self):
+        return self.app.get('/cache/stats').json
+
+    def test_customer_lookups_are_cached(self):
+        for _ in range(3):
+            self.assertEqual(self.app.get(f'/customers/{self.customer_id}').json['name'], 'Test Customer')
+        self.assertEqual(self.stats()['misses'], 1)
+        self.assertEqual(self.stats()['hits'], 2)
+
+        response = self.app.post('/orders', json={'customer_id': self.customer_id, 'item': 'A', 'amount': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stats()['hits'], 3)
+
+    def test_update_invalidates_customer(self):
+        self.app.get(f'/customers/{self.customer_id}')
+        with app.app_context():
+            db.session.get(Customer, self.customer_id).name = 'Renamed'
+            db.session.commit()
+        self.assertEqual(self.app.get(f'/customers/{self.customer_id}').json['name'], 'Renamed')
+
+    def test_rollback_keeps_cache(self):
+        self.app.get(f'/customers/{self.customer_id}')
+        with app.app_context():
+            db.session.get(Customer, self.customer_id).name = 'Renamed'
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self.stats()['invalidations'], 0)
+
+    def test_new_order_invalidates_order_pages(self):
+        url = f'/customers/{self.customer_id}/orders'
+        self.assertEqual(self.app.get(url).json['orders'], [])
+        self.assertEqual(self.app.get(url).json['orders'], [])
+        self.assertEqual(self.stats()['hits'], 2)  # customer check and the page
+
+        self.app.post('/orders', json={'customer_id': self.customer_id, 'item': 'A', 'amount': 1})
+        self.assertEqual([order['item'] for order in self.app.get(url).json['orders']], ['A'])
+
+        self.app.post('/orders/bulk', json=[{'customer_id': self.customer_id, 'item': 'B', 'amount': 2}])
+        self.assertEqual(len(self.app.get(url).json['orders']), 2)
+
+    def test_new_customer_invalidates_listing(self):
+        self.assertEqual(len(self.app.get('/customers').json['customers']), 1)
+        self.app.post('/customers', json={'name': 'Jane Doe', 'phone_number': '+254701234567'})
+        self.assertEqual(len(self.app.get('/customers').json['customers']), 2)
+
+
+class TestRedisBackend(unittest.TestCase):
+    """ two apps sharing one database and a fakeredis server, like two gunicorn workers """
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'workers.db')}"
+        with patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeStrictRedis(server=server)):
+            self.workers = [create_app({'SQLALCHEMY_DATABASE_URI': url, 'CACHE_TYPE': BACKENDS['redis']})
+                            for _ in range(2)]
+        with self.workers[0].app_context():
+            db.create_all()
+            customer = Customer(name="Test Customer", phone_number="+254700000000")
+            db.session.add(customer)
+            db.session.commit()
+            self.customer_id = customer.id
+
+    def test_write_invalidates_every_worker(self):
+        first, second = (worker.test_client() for worker in self.workers)
+        url = f'/customers/{self.customer_id}/orders'
+        self.assertEqual(first.get(url).json['orders'], [])
+        with self.workers[0].app_context():
+            self.assertIsNotNone(cache.cache._read_client.get(f'{cache.cache.key_prefix}customer:{self.customer_id}'))
+
+        second.post('/orders', json={'customer_id': self.customer_id, 'item': 'A', 'amount': 1})
+        self.assertEqual([order['item'] for order in first.get(url).json['orders']], ['A'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from app import app, create_app, db, generate_customer_code, Customer, CodeSequence
+from code_allocator import CODE_BITS, CodeAllocator, encode, is_legacy_code, permute
+
+
+class TestPermutation(unittest.TestCase):
+    def test_permute_is_a_bijection(self):
+        key = b'k' * 32
+        values = range(0, 1 << CODE_BITS, (1 << CODE_BITS) // 50000)
+        codes = {permute(value, key) for value in values}
+        self.assertEqual(len(codes), len(values))
+        self.assertTrue(all(0 <= code < 1 << CODE_BITS for code in codes))
+
+    def test_key_changes_codes(self):
+        self.assertNotEqual(permute(1, b'a' * 32), permute(1, b'b' * 32))
+
+    def test_sequential_values_are_not_sequential_codes(self):
+        key = b'k' * 32
+        self.assertNotEqual(permute(2, key) - permute(1, key), permute(3, key) - permute(2, key))
+
+    def test_codes_never_look_legacy(self):
+        self.assertEqual(len(encode(0)), 8)
+        self.assertTrue(is_legacy_code('CUST12345'))
+        self.assertFalse(is_legacy_code('CUST' + encode(12345)))
+
+
+class TestCodeAllocator(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def allocator(self, block_size):
+        return CodeAllocator(db.engine, CodeSequence, key='secret', block_size=block_size)
+
+    def test_parallel_workers_never_collide(self):
+        # two "workers" with small blocks, each drawing codes from several threads
+        workers = [self.allocator(block_size=50), self.allocator(block_size=70)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(lambda i: workers[i % 2].next_code(), range(5000)))
+        self.assertEqual(len(set(codes)), 5000)
+        self.assertTrue(all(code.startswith('CUST') and len(code) == 12 for code in codes))
+
+        sequence = db.session.get(CodeSequence, 'customer_code')
+        self.assertGreaterEqual(sequence.next_value, 5000)
+
+    def test_missing_key_is_refused(self):
+        worker = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                             'CUSTOMER_CODE_KEY': None})
+        with worker.app_context(), self.assertRaisesRegex(ValueError, 'CUSTOMER_CODE_KEY'):
+            generate_customer_code()
+
+    def test_customer_gets_allocated_code(self):
+        response = self.app.post('/customers', json={'name': 'John Doe', 'phone_number': '+254701234567'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json['code']), 12)
+        self.assertFalse(is_legacy_code(response.json['code']))
+
+    def test_recode_legacy_customers(self):
+        db.session.add_all([
+            Customer(name='Old', phone_number='+254700000001', code='CUST12345'),
+            Customer(name='New', phone_number='+254700000002'),
+        ])
+        db.session.commit()
+        new_code = db.session.scalars(db.select(Customer.code).where(Customer.name == 'New')).one()
+
+        result = app.test_cli_runner().invoke(args=['migrate-customer-codes', '--recode'])
+        self.assertIn('Re-coded 1 customers', result.output)
+
+        db.session.expire_all()
+        codes = dict(db.session.execute(db.select(Customer.name, Customer.code)).all())
+        self.assertFalse(is_legacy_code(codes['Old']))
+        self.assertEqual(codes['New'], new_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import africastalking
+from flask_sqlalchemy.record_queries import get_recorded_queries
+from sqlalchemy import inspect
+from app import create_app, db, send_sms, CodeSequence, Customer, CustomerOrderTotals
+from config import MySQLConfig, SQLiteConfig, load_config, profile_for
+
+
+class TestCreateApp(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.url = f"sqlite:///{os.path.join(directory, 'factory.db')}"
+
+    def test_overrides(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url, 'PAGE_SIZE': 7})
+        self.assertEqual(app.config['PAGE_SIZE'], 7)
+        self.assertEqual(app.config['MAX_PAGE_SIZE'], 200)
+        self.assertIn('api.add_customer', app.view_functions)
+
+    def test_engine_is_built_on_first_use(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url})
+        engines = db._app_engines[app]
+        self.assertIn(None, engines)
+        self.assertEqual(engines.built(), {})
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Customer(name='Lazy', phone_number='+254700000000'))
+            db.session.commit()
+        self.assertEqual(list(engines.built()), [None])
+        self.assertIs(engines[None], engines.built()[None])
+
+        response = app.test_client().get('/customers')
+        self.assertEqual(response.json['customers'][0]['name'], 'Lazy')
+
+    def test_apps_allocate_codes_from_their_own_database(self):
+        apps = [create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'codes.db')}",
+                            'CUSTOMER_CODE_KEY': key}) for key in ('key-a', 'key-b')]
+        for app in apps:
+            with app.app_context():
+                db.create_all()
+        codes = [app.test_client().post('/customers', json={'name': 'John Doe', 'phone_number': '+254701234567'})
+                 .json['code'] for app in apps]
+
+        # same first value, different keys, so the codes differ
+        self.assertNotEqual(codes[0], codes[1])
+        for app in apps:
+            with app.app_context():
+                self.assertGreater(db.session.get(CodeSequence, 'customer_code').next_value, 0)
+            self.assertIs(app.extensions['code_allocator'].engine, db._app_engines[app][None])
+
+    def test_sms_sdk_is_initialized_on_first_send(self):
+        gateway = MagicMock()
+        config = {'AT_USERNAME': 'sandbox', 'AT_API_KEY': 'key', 'SMS_SENDER_ID': '20267'}
+        with patch.object(africastalking, 'SMS', None), \
+                patch.object(africastalking, 'initialize',
+                             side_effect=lambda **kwargs: setattr(africastalking, 'SMS', gateway)) as initialize:
+            send_sms('hi', ['+254700000000'], config)
+            send_sms('again', ['+254700000000'], config)
+        initialize.assert_called_once_with(username='sandbox', api_key='key')
+        gateway.send.assert_called_with('again', ['+254700000000'], sender_id='20267')
+
+    def test_init_db_upgrades_existing_schema(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url})
+        with app.app_context():
+            # the tables as the first release created them, without the later index and tables
+            db.session.execute(db.text(
+                "CREATE TABLE customer (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+                "code VARCHAR(50) NOT NULL UNIQUE, phone_number VARCHAR(20) NOT NULL)"))
+            db.session.execute(db.text(
+                "CREATE TABLE \"order\" (id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL REFERENCES customer(id), "
+                "item VARCHAR(100) NOT NULL, amount FLOAT NOT NULL, time DATETIME NOT NULL)"))
+            db.session.execute(db.text("INSERT INTO customer VALUES (1, 'Old', 'CUST12345', '+254700000000')"))
+            db.session.execute(db.text("INSERT INTO \"order\" VALUES (1, 1, 'Laptop', 10.5, '2024-01-01 09:15:00')"))
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        self.assertIsNone(result.exception, result.output)
+        self.assertIn('Created index ix_order_customer_time on order', result.output)
+        self.assertIn('Created table sms_outbox', result.output)
+
+        with app.app_context():
+            inspector = inspect(db.engine)
+            self.assertIn('ix_order_customer_time', {index['name'] for index in inspector.get_indexes('order')})
+            self.assertEqual(db.session.get(CustomerOrderTotals, 1).order_count, 1)
+
+        # nothing left to do the second time
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        self.assertNotIn('Created', result.output)
+
+    def test_sqlite_override_skips_mysql_pool_options(self):
+        with patch.dict(os.environ, {'APP_CONFIG': 'mysql'}):
+            app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS'], {})
+        with app.app_context():
+            db.create_all()
+            self.assertEqual(db.session.scalar(db.select(db.func.count()).select_from(Customer)), 0)
+
+    def test_record_queries(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url, 'SQLALCHEMY_RECORD_QUERIES': True})
+        with app.test_request_context():
+            db.create_all()
+            db.session.scalars(db.select(Customer)).all()
+            self.assertTrue(any('FROM customer' in query.statement for query in get_recorded_queries()))
+
+    def test_profiles(self):
+        self.assertIs(load_config('sqlite'), SQLiteConfig)
+        self.assertIs(load_config('mysql'), MySQLConfig)
+        self.assertTrue(MySQLConfig.SQLALCHEMY_ENGINE_OPTIONS['pool_pre_ping'])
+        with self.assertRaises(ValueError):
+            load_config('oracle')
+        self.assertEqual(profile_for('sqlite:///customer_order.db'), 'sqlite')
+        self.assertIsNone(profile_for('mysql+pymysql://user@localhost/customer_order'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+import metrics
+from app import app, create_app, db, Customer
+from metrics import Counter, Histogram, Registry, timed_send
+
+
+class TestExposition(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.register(Histogram('latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0)))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, '/a"b')
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP latency_seconds Latency.',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{route="/a\\"b",le="0.1"} 2',
+            'latency_seconds_bucket{route="/a\\"b",le="1.0"} 3',
+            'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+            'latency_seconds_sum{route="/a\\"b"} 3.65',
+            'latency_seconds_count{route="/a\\"b"} 4',
+        ])
+
+    def test_counter(self):
+        registry = Registry()
+        sent = registry.register(Counter('sent', 'Sent.', ('outcome',)))
+        sent.inc('ok')
+        sent.inc('ok', amount=2)
+        self.assertIn('sent_total{outcome="ok"} 3', registry.render())
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_route_and_sql_metrics(self):
+        route = ('GET', '/customers/<int:customer_id>')
+        requests = metrics.http_requests.value(*route, 404)
+        queries = metrics.http_request_queries.total(*route)
+        statements = metrics.sql_query_duration.count()
+
+        self.app.get('/customers/12345')
+
+        self.assertEqual(metrics.http_requests.value(*route, 404), requests + 1)
+        self.assertEqual(metrics.http_request_queries.total(*route), queries + 1)
+        self.assertGreater(metrics.sql_query_duration.count(), statements)
+
+        body = self.app.get('/metrics').get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/customers/<int:customer_id>",le="+Inf"}',
+                      body)
+        self.assertIn('# TYPE db_pool_checkout_wait_seconds histogram', body)
+
+    def test_slow_request_log(self):
+        with app.app_context():
+            db.session.add(Customer(name='Slow Customer', phone_number='+254700000000'))
+            db.session.commit()
+        # same database, every request counts as slow
+        slow_app = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                               'METRICS_SLOW_REQUEST_MS': 0.001})
+        with self.assertLogs('metrics', 'WARNING') as logs:
+            slow_app.test_client().get('/customers?limit=1')
+        self.assertIn('Slow request GET /customers?limit=1 200', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class TestSMSMetrics(unittest.TestCase):
+    def test_send_outcomes(self):
+        accepted = metrics.sms_recipients.value('accepted')
+        rejected = metrics.sms_recipients.value('rejected')
+        failures = metrics.sms_send_failures.value()
+
+        def gateway(message, recipients):
+            return {'SMSMessageData': {'Recipients': [
+                {'number': number, 'statusCode': 101 if number.endswith('1') else 403} for number in recipients
+            ]}}
+
+        timed_send(gateway)('hi', ['+254700000001', '+254700000002'])
+        self.assertEqual(metrics.sms_recipients.value('accepted'), accepted + 1)
+        self.assertEqual(metrics.sms_recipients.value('rejected'), rejected + 1)
+
+        def broken(message, recipients):
+            raise Exception('gateway unavailable')
+
+        with self.assertRaises(Exception):
+            timed_send(broken)('hi', ['+254700000001'])
+        self.assertEqual(metrics.sms_send_failures.value(), failures + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import csv
+import gzip
+import io
+import json
+import unittest
+from unittest.mock import patch
+from app import app, db, Customer
+from order_export import gzip_chunks
+
+
+class TestOrderExport(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            customers = [Customer(name=f"Customer {i}", phone_number=f"+25470000000{i}") for i in range(2)]
+            db.session.add_all(customers)
+            db.session.commit()
+            self.customer_ids = [customer.id for customer in customers]
+        first, second = self.customer_ids
+        body = '\n'.join(json.dumps(row) for row in [
+            {'customer_id': first, 'item': 'Laptop, 15"', 'amount': 999.5, 'time': '2024-01-01T10:00:00'},
+            {'customer_id': second, 'item': 'Phone', 'amount': 300, 'time': '2024-01-02T10:00:00'},
+            {'customer_id': first, 'item': 'Cable', 'amount': 5.25, 'time': '2024-01-03T10:00:00'},
+        ])
+        self.app.post('/orders/bulk', data=body, content_type='application/x-ndjson')
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_csv(self):
+        response = self.app.get('/orders/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([row['item'] for row in rows], ['Laptop, 15"', 'Phone', 'Cable'])
+        self.assertEqual(rows[0]['time'], '2024-01-01T10:00:00')
+
+    def test_ndjson_filters(self):
+        first = self.customer_ids[0]
+        response = self.app.get(f'/orders/export?format=ndjson&customer_id={first}&since=2024-01-02')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(rows, [{'id': 3, 'customer_id': first, 'item': 'Cable', 'amount': 5.25,
+                                 'time': '2024-01-03T10:00:00'}])
+
+    def test_batches_and_gzip(self):
+        with patch.dict(app.config, {'EXPORT_BATCH_SIZE': 1}):
+            response = self.app.get('/orders/export?until=2024-01-03', headers={'Accept-Encoding': 'gzip'})
+            chunks = list(response.response)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        # header, one flush per batch of one row and the gzip trailer
+        self.assertEqual(len(chunks), 4)
+        text = gzip.decompress(b''.join(chunks)).decode()
+        self.assertEqual(text.splitlines()[0], 'id,customer_id,item,amount,time')
+        self.assertEqual(len(text.splitlines()), 3)
+
+    def test_time_range_is_read_in_time_order(self):
+        # a late import of an older order gets a higher id
+        self.app.post('/orders/bulk', json=[
+            {'customer_id': self.customer_ids[1], 'item': 'Late', 'amount': 1, 'time': '2024-01-02T09:00:00'}])
+        response = self.app.get('/orders/export?format=ndjson&since=2024-01-02&until=2024-01-04')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([row['item'] for row in rows], ['Late', 'Phone', 'Cable'])
+        with app.app_context():
+            self.assertIn('ix_order_time', {index['name'] for index in db.inspect(db.engine).get_indexes('order')})
+
+    def test_empty_export(self):
+        response = self.app.get('/orders/export?since=2030-01-01')
+        self.assertEqual(response.get_data(as_text=True), 'id,customer_id,item,amount,time\n')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.app.get('/orders/export?format=xml').status_code, 400)
+        self.assertEqual(self.app.get('/orders/export?customer_id=abc').status_code, 400)
+        self.assertEqual(self.app.get('/orders/export?since=yesterday').status_code, 400)
+
+    def test_gzip_chunks(self):
+        data = [b'a' * 1000, b'b' * 1000]
+        self.assertEqual(gzip.decompress(b''.join(gzip_chunks(iter(data)))), b''.join(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
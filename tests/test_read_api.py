@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app import app, db, Customer, Order
+
+
+class TestReadAPI(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            customers = [Customer(name=f"Customer {i}", phone_number=f"+25470000000{i}") for i in range(5)]
+            db.session.add_all(customers)
+            db.session.commit()
+            self.customer_id = customers[0].id
+
+            # two orders share every timestamp so the id breaks ties
+            start = datetime(2024, 1, 1)
+            db.session.add_all(
+                Order(customer_id=self.customer_id, item=f"Item {i}", amount=i, time=start + timedelta(hours=i // 2))
+                for i in range(25)
+            )
+            db.session.add(Order(customer_id=customers[1].id, item="Other", amount=1, time=start))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def pages(self, url, key, **params):
+        items, cursor = [], None
+        while True:
+            response = self.app.get(url, query_string={**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            items.extend(response.json[key])
+            cursor = response.json['next_cursor']
+            if not cursor:
+                return items
+
+    def test_list_customers(self):
+        customers = self.pages('/customers', 'customers', limit=2)
+        self.assertEqual([customer['name'] for customer in customers], [f"Customer {i}" for i in range(5)])
+        self.assertTrue(all(customer['code'] for customer in customers))
+
+    def test_get_customer(self):
+        response = self.app.get(f'/customers/{self.customer_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['name'], 'Customer 0')
+        self.assertEqual(self.app.get('/customers/9999').status_code, 404)
+
+    def test_customer_orders_newest_first(self):
+        orders = self.pages(f'/customers/{self.customer_id}/orders', 'orders', limit=4)
+        self.assertEqual([order['item'] for order in orders], [f"Item {i}" for i in reversed(range(25))])
+
+    def test_customer_orders_time_range(self):
+        orders = self.pages(f'/customers/{self.customer_id}/orders', 'orders', limit=3,
+                            since='2024-01-01T02:00:00', until='2024-01-01T05:00:00')
+        self.assertEqual([order['item'] for order in orders], [f"Item {i}" for i in reversed(range(4, 10))])
+
+    def test_page_size_is_bounded(self):
+        with patch.dict(app.config, {'MAX_PAGE_SIZE': 10}):
+            response = self.app.get(f'/customers/{self.customer_id}/orders', query_string={'limit': 1000})
+        self.assertEqual(len(response.json['orders']), 10)
+
+    def test_invalid_parameters(self):
+        url = f'/customers/{self.customer_id}/orders'
+        self.assertEqual(self.app.get(url, query_string={'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.app.get(url, query_string={'since': 'yesterday'}).status_code, 400)
+        response = self.app.get(url, query_string={'since': '2024-01-01T02:00:00+03:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('without a UTC offset', response.json['error'])
+        self.assertEqual(self.app.get('/orders/export', query_string={'until': '2024-01-01T02:00:00+00:00'}).status_code, 400)
+        self.assertEqual(self.app.get('/reports/revenue/daily', query_string={'since': '2024-01-01T00:00:00-05:00'}).status_code, 400)
+        self.assertEqual(self.app.get('/customers', query_string={'limit': 'ten'}).status_code, 400)
+        self.assertEqual(self.app.get('/customers/9999/orders').status_code, 404)
+
+    def test_orders_query_uses_customer_time_index(self):
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                self.skipTest('query plan check is written for SQLite')
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT * FROM \"order\" WHERE customer_id = 1 AND time <= '2024-01-02' "
+                "ORDER BY time DESC, id DESC LIMIT 51"
+            )).all()
+        self.assertIn('ix_order_customer_time', ' '.join(str(row) for row in plan))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import unittest
+from datetime import datetime, timezone
+from sqlalchemy import event
+from app import app, db, rollups, Customer, CustomerOrderTotals, Order, RevenueRollup
+from rollups import aggregate, local_time, period_start
+
+
+class TestAggregate(unittest.TestCase):
+    def test_periods(self):
+        time = datetime(2024, 3, 4, 15, 42, 7, 123)
+        self.assertEqual(period_start(time, 'hour'), datetime(2024, 3, 4, 15))
+        self.assertEqual(period_start(time, 'day'), datetime(2024, 3, 4))
+
+    def test_aggregate(self):
+        customers, periods = aggregate([
+            (1, 10.0, datetime(2024, 1, 1, 9, 30)),
+            (1, 5.5, datetime(2024, 1, 1, 8, 0)),
+            (2, 1.0, datetime(2024, 1, 2, 0, 0)),
+        ])
+        self.assertEqual(customers, {1: [2, 15.5, datetime(2024, 1, 1, 9, 30)], 2: [1, 1.0, datetime(2024, 1, 2)]})
+        self.assertEqual(periods[('day', datetime(2024, 1, 1))], [2, 15.5])
+        self.assertEqual(periods[('hour', datetime(2024, 1, 1, 8))], [1, 5.5])
+        self.assertEqual(len(periods), 5)
+
+    def test_aggregate_mixed_timezones(self):
+        aware = datetime(2024, 1, 1, 10, 15, tzinfo=timezone.utc)
+        customers, periods = aggregate([(1, 10.0, datetime(2024, 1, 1, 9, 15)), (1, 5.0, aware)])
+        self.assertEqual(customers[1][:2], [2, 15.0])
+        self.assertIsNone(customers[1][2].tzinfo)
+        self.assertEqual(sorted(periods)[0][0], 'day')
+        self.assertIn(('hour', period_start(local_time(aware), 'hour')), periods)
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            customers = [Customer(name=f"Customer {i}", phone_number=f"+25470000000{i}") for i in range(2)]
+            db.session.add_all(customers)
+            db.session.commit()
+            self.customer_ids = [customer.id for customer in customers]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_orders(self):
+        first, second = self.customer_ids
+        for amount in (100.0, 50.25):
+            response = self.app.post('/orders', json={'customer_id': first, 'item': 'Item', 'amount': amount})
+            self.assertEqual(response.status_code, 201)
+        body = '\n'.join(json.dumps(row) for row in [
+            {'customer_id': second, 'item': 'Old', 'amount': 10, 'time': '2024-01-01T09:15:00'},
+            {'customer_id': second, 'item': 'Old', 'amount': 20, 'time': '2024-01-01T09:45:00'},
+            {'customer_id': second, 'item': 'Old', 'amount': 30, 'time': '2024-01-02T23:59:59'},
+            {'customer_id': first, 'item': 'Old', 'amount': 5, 'time': '2024-01-02T10:00:00'},
+        ])
+        response = self.app.post('/orders/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.json['inserted'], 4)
+
+    def test_bulk_chunk_with_mixed_timezones(self):
+        _, second = self.customer_ids
+        response = self.app.post('/orders/bulk', json=[
+            {'customer_id': second, 'item': 'Old', 'amount': 10, 'time': '2024-01-01T09:15:00'},
+            {'customer_id': second, 'item': 'Old', 'amount': 20, 'time': '2024-01-01T10:15:00Z'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['inserted'], 1)
+        with app.app_context():
+            self.assertEqual(rollups.verify(db.session, Order), [])
+
+    def test_rollups_are_written_last(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT'):
+                statements.append(statement.split('(')[0].split()[-1].strip('"`'))
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = self.app.post('/orders', json={'customer_id': self.customer_ids[0], 'item': 'A', 'amount': 1})
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(statements, ['order', 'sms_outbox', 'customer_order_totals', 'revenue_rollup'])
+
+    def test_incremental_rollups_match_orders(self):
+        self.add_orders()
+        first, second = self.customer_ids
+
+        response = self.app.get(f'/reports/customers/{second}')
+        self.assertEqual(response.json, {'customer_id': second, 'order_count': 3, 'amount_total': 60.0,
+                                         'last_order_at': '2024-01-02T23:59:59'})
+        totals = self.app.get(f'/reports/customers/{first}').json
+        self.assertEqual((totals['order_count'], totals['amount_total']), (3, 155.25))
+
+        response = self.app.get('/reports/revenue/daily?until=2024-01-03')
+        self.assertEqual(response.json['revenue'], [
+            {'period_start': '2024-01-01T00:00:00', 'order_count': 2, 'amount_total': 30.0},
+            {'period_start': '2024-01-02T00:00:00', 'order_count': 2, 'amount_total': 35.0},
+        ])
+        response = self.app.get('/reports/revenue/hourly?since=2024-01-01&until=2024-01-02&limit=1')
+        self.assertEqual(response.json['revenue'], [
+            {'period_start': '2024-01-01T09:00:00', 'order_count': 2, 'amount_total': 30.0},
+        ])
+        self.assertIsNone(response.json['next_cursor'])
+
+        with app.app_context():
+            self.assertEqual(rollups.verify(db.session, Order), [])
+
+    def test_customer_pages(self):
+        self.add_orders()
+        response = self.app.get('/reports/customers?limit=1')
+        self.assertEqual([row['customer_id'] for row in response.json['customers']], self.customer_ids[:1])
+        response = self.app.get(f"/reports/customers?limit=1&cursor={response.json['next_cursor']}")
+        self.assertEqual([row['customer_id'] for row in response.json['customers']], self.customer_ids[1:])
+        self.assertEqual(self.app.get('/reports/customers?cursor=bogus').status_code, 400)
+        self.assertEqual(self.app.get('/reports/customers/9999').status_code, 404)
+
+    def test_rebuild_and_verify(self):
+        self.add_orders()
+        with app.app_context():
+            db.session.get(CustomerOrderTotals, self.customer_ids[0]).order_count += 1
+            db.session.execute(db.delete(RevenueRollup).where(RevenueRollup.grain == 'hour'))
+            db.session.commit()
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['rebuild-rollups', '--verify-only'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn(f'customer {self.customer_ids[0]}', result.output)
+
+        result = runner.invoke(args=['rebuild-rollups'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Rollups match the orders', result.output)
+        self.assertEqual(self.app.get(f'/reports/customers/{self.customer_ids[0]}').json['order_count'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from app import app, db, Customer
+
+
+class TestRequestValidation(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            customer = Customer(name="Test Customer", phone_number="+254700000000")
+            db.session.add(customer)
+            db.session.commit()
+            self.customer_id = customer.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def assertRejected(self, response, error, detail):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {'error': error, 'detail': detail})
+
+    def test_order_missing_item(self):
+        response = self.app.post('/orders', json={'customer_id': self.customer_id, 'amount': 10})
+        self.assertRejected(response, 'Missing required fields', 'Object missing required field `item`')
+
+    def test_order_string_amount(self):
+        response = self.app.post('/orders', json={'customer_id': self.customer_id, 'item': 'A', 'amount': '10'})
+        self.assertRejected(response, 'Invalid request body', 'Expected `float`, got `str` - at `$.amount`')
+
+    def test_customer_empty_name(self):
+        response = self.app.post('/customers', json={'name': '', 'phone_number': '+254700000001'})
+        self.assertRejected(response, 'Missing required fields', 'Expected `str` of length >= 1 - at `$.name`')
+
+    def test_customer_null_phone_number(self):
+        response = self.app.post('/customers', json={'name': 'John Doe', 'phone_number': None})
+        self.assertRejected(response, 'Missing required fields', 'Expected `str`, got `null` - at `$.phone_number`')
+
+    def test_wrong_body_type(self):
+        response = self.app.post('/orders', json=[1, 2])
+        self.assertRejected(response, 'Invalid request body', 'Expected `object`, got `array`')
+
+    def test_malformed_json(self):
+        response = self.app.post('/customers', data='{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['error'], 'Invalid JSON')
+
+    def test_valid_order(self):
+        response = self.app.post('/orders', json={'customer_id': self.customer_id, 'item': 'A', 'amount': 10})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json, {'message': 'Order added', 'order_id': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+import fakeredis
+from flask import Flask, session
+from sqlalchemy import func, select
+from session_store import DBSessionInterface, init_sessions, sessions_table
+
+
+def make_worker(backend, directory):
+    """ a minimal app standing in for one gunicorn worker """
+    worker = Flask(__name__)
+    worker.config.update(
+        SECRET_KEY='test-secret',
+        SESSION_BACKEND=backend,
+        SESSION_PERMANENT=False,
+        SESSION_FILE_DIR=os.path.join(directory, 'sessions'),
+        SESSION_FILE_THRESHOLD=500,
+        SESSION_DB_URL=f"sqlite:///{os.path.join(directory, 'sessions.db')}",
+        SESSION_REDIS_URL='redis://localhost:6379/0',
+    )
+    init_sessions(worker)
+
+    @worker.route('/login')
+    def login():
+        session['state'] = 'abc'
+        return 'ok'
+
+    @worker.route('/callback')
+    def callback():
+        return session.pop('state', 'missing')
+
+    return worker
+
+
+class TestSessionBackends(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def handoff(self, backend):
+        """ state stored by one worker is read back by another """
+        first, second = make_worker(backend, self.directory), make_worker(backend, self.directory)
+        client = first.test_client()
+        client.get('/login')
+        cookie = client.get_cookie('session')
+
+        other = second.test_client()
+        other.set_cookie('session', cookie.value)
+        self.assertEqual(other.get('/callback').data, b'abc')
+        self.assertEqual(other.get('/callback').data, b'missing')
+
+    def test_cookie_handoff(self):
+        self.handoff('cookie')
+
+    def test_filesystem_handoff(self):
+        self.handoff('filesystem')
+
+    def test_db_handoff(self):
+        self.handoff('db')
+
+    def test_redis_handoff(self):
+        server = fakeredis.FakeServer()
+        with patch('redis.Redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis(server=server)):
+            self.handoff('redis')
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            make_worker('memcached', self.directory)
+
+    def test_db_expiry(self):
+        worker = make_worker('db', self.directory)
+        interface = worker.session_interface
+        self.assertIsInstance(interface, DBSessionInterface)
+
+        live = interface.session_class({'user': 'live'}, sid='live')
+        interface._upsert_session(timedelta(hours=1), live, 'session:live')
+        interface._upsert_session(timedelta(hours=1), live, 'session:live')  # upsert, not a duplicate
+        for i in range(5):
+            expired = interface.session_class({'user': i}, sid=f'old{i}')
+            interface._upsert_session(timedelta(seconds=-1), expired, f'session:old{i}')
+
+        self.assertIsNone(interface._retrieve_session_data('session:old0'))
+        self.assertEqual(interface._retrieve_session_data('session:live'), {'user': 'live'})
+
+        interface.cleanup_batch_size = 2
+        interface._delete_expired_sessions()
+        with interface.engine.connect() as conn:
+            self.assertEqual(conn.scalar(select(func.count()).select_from(sessions_table)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import event
+from app import app, db, Customer, SMSOutbox
+from sms_dispatcher import SMSDispatcher, FAILED, PENDING, SENDING, SENT, same_number
+
+
+class FakeGateway:
+    """ local stand-in for the Africa's Talking SMS API """
+    def __init__(self, fail=False, reject=(), country_code='254', omit=()):
+        self.calls = []
+        self.fail = fail
+        self.reject = set(reject)
+        self.country_code = country_code
+        self.omit = set(omit)
+
+    def send(self, message, recipients):
+        self.calls.append((message, list(recipients)))
+        if self.fail:
+            raise Exception("gateway unavailable")
+        # like Africa's Talking, numbers come back in international form
+        return {'SMSMessageData': {'Recipients': [
+            {'number': self.international(number), 'statusCode': 403 if number in self.reject else 101}
+            for number in reversed(recipients) if number not in self.omit
+        ]}}
+
+    def international(self, number):
+        return '+' + self.country_code + number[1:] if number.startswith('0') else number
+
+
+class TestSMSDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def dispatcher(self, gateway, **kwargs):
+        dispatcher = SMSDispatcher(db.engine, SMSOutbox, gateway.send, workers=2, **kwargs)
+        self.addCleanup(dispatcher.stop)
+        return dispatcher
+
+    def queue(self, *messages):
+        db.session.add_all(SMSOutbox(phone_number=phone, message=text) for phone, text in messages)
+        db.session.commit()
+
+    def test_order_is_queued_not_sent(self):
+        customer = Customer(name="Test Customer", phone_number="+254700000000")
+        db.session.add(customer)
+        db.session.commit()
+
+        with patch('app.sms_service') as mock_sms:
+            response = self.app.post('/orders', json={
+                'customer_id': customer.id,
+                'item': 'Test Item',
+                'amount': 150.75
+            })
+        self.assertEqual(response.status_code, 201)
+        mock_sms.assert_not_called()
+
+        outbox = db.session.scalars(db.select(SMSOutbox)).all()
+        self.assertEqual(len(outbox), 1)
+        self.assertEqual(outbox[0].phone_number, "+254700000000")
+        self.assertIn('Test Item', outbox[0].message)
+        self.assertEqual(self.app.get('/sms/outbox').json['queue_depth'], 1)
+
+    def test_identical_messages_are_batched(self):
+        self.queue(("+254700000001", "hello"), ("+254700000002", "hello"), ("+254700000003", "bye"))
+        gateway = FakeGateway()
+
+        self.assertEqual(self.dispatcher(gateway).dispatch_once(), 3)
+        self.assertEqual(sorted(gateway.calls), [
+            ("bye", ["+254700000003"]),
+            ("hello", ["+254700000001", "+254700000002"]),
+        ])
+        statuses = db.session.scalars(db.select(SMSOutbox.status)).all()
+        self.assertEqual(statuses, [SENT] * 3)
+
+    def test_same_recipient_gets_every_message(self):
+        self.queue(("+254700000001", "hello"), ("+254700000001", "hello"))
+        gateway = FakeGateway()
+
+        self.dispatcher(gateway).dispatch_once()
+        self.assertEqual(gateway.calls, [("hello", ["+254700000001"])] * 2)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        self.queue(("+254700000001", "hello"), ("+254700000002", "hello"))
+        dispatcher = self.dispatcher(FakeGateway(reject={"+254700000002"}), backoff_base=30)
+
+        before = datetime.now()
+        dispatcher.dispatch_once()
+        sent, retry = db.session.scalars(db.select(SMSOutbox).order_by(SMSOutbox.id)).all()
+        self.assertEqual(sent.status, SENT)
+        self.assertEqual(retry.status, PENDING)
+        self.assertEqual(retry.attempts, 1)
+        self.assertGreaterEqual(retry.next_attempt_at, before + timedelta(seconds=30))
+
+        # not due yet, so nothing is claimed
+        self.assertEqual(dispatcher.dispatch_once(), 0)
+        self.assertEqual(dispatcher.queue_depth(), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        self.queue(("+254700000001", "hello"))
+        gateway = FakeGateway(fail=True)
+        dispatcher = self.dispatcher(gateway, max_attempts=2, backoff_base=0)
+
+        dispatcher.dispatch_once()
+        dispatcher.dispatch_once()
+        message = db.session.scalars(db.select(SMSOutbox)).one()
+        self.assertEqual(message.status, FAILED)
+        self.assertEqual(message.attempts, 2)
+        self.assertEqual(message.last_error, "gateway unavailable")
+        self.assertEqual(len(gateway.calls), 2)
+        self.assertEqual(dispatcher.queue_depth(), 0)
+
+    def test_local_numbers_match_the_gateway_response(self):
+        self.queue(("0700000001", "hello"), ("0700000002", "hello"))
+        gateway = FakeGateway(reject={"0700000002"})
+
+        self.dispatcher(gateway).dispatch_once()
+        sent, retry = db.session.scalars(db.select(SMSOutbox).order_by(SMSOutbox.id)).all()
+        self.assertEqual(sent.status, SENT)
+        self.assertEqual(retry.status, PENDING)
+        self.assertTrue(same_number("0700000001", "+254700000001"))
+        self.assertFalse(same_number("0700000001", "+254700000002"))
+
+    def test_unreported_recipient_is_not_retried(self):
+        self.queue(("+254700000001", "hello"), ("+254700000002", "hello"))
+        gateway = FakeGateway(omit={"+254700000002"})
+        dispatcher = self.dispatcher(gateway, backoff_base=0)
+
+        dispatcher.dispatch_once()
+        self.assertEqual(dispatcher.dispatch_once(), 0)
+        sent, unknown = db.session.scalars(db.select(SMSOutbox).order_by(SMSOutbox.id)).all()
+        self.assertEqual(sent.status, SENT)
+        self.assertEqual(unknown.status, FAILED)
+        self.assertEqual(unknown.last_error, "no status reported by gateway")
+        self.assertEqual(len(gateway.calls), 1)
+
+    def test_claimed_rows_are_leased(self):
+        self.queue(("+254700000001", "hello"), ("+254700000002", "bye"))
+        first = self.dispatcher(FakeGateway())
+        second = self.dispatcher(FakeGateway())
+
+        claimed = first.claim()
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(second.claim(), [])
+        statuses = db.session.scalars(db.select(SMSOutbox.status)).all()
+        self.assertEqual(statuses, [SENDING] * 2)
+
+    def test_row_changed_since_read_is_not_claimed(self):
+        self.queue(("+254700000001", "hello"))
+        dispatcher = self.dispatcher(FakeGateway())
+        read = dispatcher.Session
+
+        def racing_session(**kwargs):
+            # another dispatcher leases the row between this one's SELECT and UPDATE
+            session = read(**kwargs)
+
+            @event.listens_for(session, 'do_orm_execute')
+            def lease_first(state):
+                if state.is_update:
+                    state.session.connection().execute(
+                        db.update(SMSOutbox).values(status=SENDING, next_attempt_at=datetime.now() + timedelta(minutes=1)))
+            return session
+
+        with patch.object(dispatcher, 'Session', racing_session):
+            self.assertEqual(dispatcher.claim(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import base64
+import json
+import time
+import unittest
+from unittest.mock import patch
+from authlib.jose import JsonWebKey, jwt
+from app import app, create_app, db
+from token_auth import AuthError, JWKSCache, TokenVerifier, bearer_token
+
+ISSUER = 'https://tenant.example.com/'
+AUDIENCE = 'https://api.example.com'
+
+
+class KeyServer:
+    """ stands in for the Auth0 JWKS endpoint """
+
+    def __init__(self):
+        self.keys = [self.new_key('key-1')]
+        self.fetches = 0
+
+    @staticmethod
+    def new_key(kid):
+        return JsonWebKey.generate_key('RSA', 2048, is_private=True, options={'kid': kid})
+
+    def fetch(self):
+        self.fetches += 1
+        return {'keys': [key.as_dict(is_private=False) for key in self.keys]}
+
+    def token(self, key=None, **claims):
+        key = key or self.keys[0]
+        payload = {'iss': ISSUER, 'aud': AUDIENCE, 'sub': 'client@clients', 'iat': int(time.time()),
+                   'exp': int(time.time()) + 3600}
+        payload.update(claims)
+        return jwt.encode({'alg': 'RS256', 'kid': key.kid}, payload, key).decode()
+
+
+class TestTokenVerifier(unittest.TestCase):
+    def setUp(self):
+        self.server = KeyServer()
+        self.jwks = JWKSCache(self.server.fetch, refresh_interval=0, min_refresh_interval=30)
+        self.verifier = TokenVerifier(self.jwks, ISSUER, AUDIENCE, leeway=0, cache_size=2)
+
+    def test_valid_token_is_cached(self):
+        token = self.server.token()
+        self.assertEqual(self.verifier.verify(token)['sub'], 'client@clients')
+        with patch.object(self.verifier._jwt, 'decode', side_effect=AssertionError('not cached')):
+            self.assertEqual(self.verifier.verify(token)['sub'], 'client@clients')
+        self.assertEqual(self.server.fetches, 1)
+
+    def test_rejected_tokens(self):
+        other = KeyServer.new_key('key-1')
+        for token in (
+            self.server.token(aud='https://other.example.com'),
+            self.server.token(iss='https://evil.example.com/'),
+            self.server.token(exp=int(time.time()) - 10),
+            self.server.token(key=other),  # right kid, wrong signature
+            'not.a.token',
+            'W10.e30.x',  # the header is JSON, but not an object
+        ):
+            with self.assertRaises(AuthError):
+                self.verifier.verify(token)
+
+    def test_rotated_key_is_fetched_once(self):
+        self.verifier.verify(self.server.token())
+        rotated = KeyServer.new_key('key-2')
+        self.server.keys.append(rotated)
+
+        # within min_refresh_interval an unknown kid does not refetch
+        with self.assertRaises(AuthError):
+            self.verifier.verify(self.server.token(key=rotated))
+        self.assertEqual(self.server.fetches, 1)
+
+        self.jwks._refreshed_at -= 60
+        self.assertEqual(self.verifier.verify(self.server.token(key=rotated, sub='rotated'))['sub'], 'rotated')
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_failed_refresh_keeps_keys(self):
+        token = self.server.token()
+        self.jwks.refresh()
+        self.jwks.fetch = lambda: (_ for _ in ()).throw(OSError('Auth0 unreachable'))
+        self.assertFalse(self.jwks.refresh())
+        self.assertEqual(self.verifier.verify(token)['sub'], 'client@clients')
+
+    def test_audience_is_required(self):
+        with self.assertRaises(ValueError):
+            TokenVerifier(self.jwks, ISSUER, None)
+
+    def test_bearer_header(self):
+        self.assertIsNone(bearer_token(None))
+        self.assertEqual(bearer_token('Bearer abc.def.ghi'), 'abc.def.ghi')
+        with self.assertRaises(AuthError):
+            bearer_token('Basic dXNlcjpwYXNz')
+
+
+class TestProtectedAPI(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        self.server = KeyServer()
+        self.config = patch.dict(app.config, {'API_AUTH_REQUIRED': True})
+        self.config.start()
+        app.extensions['token_verifier'] = TokenVerifier(
+            JWKSCache(self.server.fetch, refresh_interval=0), ISSUER, AUDIENCE)
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        self.config.stop()
+        del app.extensions['token_verifier']
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_bearer_token(self):
+        headers = {'Authorization': f'Bearer {self.server.token()}'}
+        response = self.app.post('/customers', json={'name': 'John Doe', 'phone_number': '+254701234567'},
+                                 headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.app.get('/customers', headers=headers).status_code, 200)
+
+    def test_missing_or_invalid_token(self):
+        response = self.app.get('/customers')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.headers['WWW-Authenticate'], 'Bearer')
+
+        response = self.app.get('/customers', headers={'Authorization': 'Bearer not.a.token'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json['error'], 'Malformed token')
+
+    def test_header_not_an_object(self):
+        response = self.app.get('/customers', headers={'Authorization': 'Bearer W10.e30.x'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json['error'], 'Malformed token')
+
+    def test_kid_not_a_string(self):
+        for kid in ([], {}, 1, None):
+            header = base64.urlsafe_b64encode(json.dumps({'alg': 'RS256', 'kid': kid}).encode()).decode().rstrip('=')
+            response = self.app.get('/customers', headers={'Authorization': f'Bearer {header}.e30.x'})
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json['error'], 'Malformed token')
+
+    def test_required_without_audience_fails_at_startup(self):
+        with self.assertRaises(ValueError):
+            create_app({'API_AUTH_REQUIRED': True, 'AUTH0_AUDIENCE': None})
+
+    def test_browser_session(self):
+        response = self.app.get('/customers', headers={'Accept': 'text/html'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+
+        with self.app.session_transaction() as sess:
+            sess['user'] = {'sub': 'user123'}
+        self.assertEqual(self.app.get('/customers').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
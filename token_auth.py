@@ -0,0 +1,162 @@
+""" local verification of Auth0-issued JWT bearer tokens
+
+Signing keys come from the JWKS published in the Auth0 metadata and are held
+in memory: refreshed in the background, and on a token signed with an unknown
+``kid`` (key rotation), at most once per ``min_refresh_interval``. Verified
+tokens are remembered in a small LRU until they expire, so a client reusing
+its token costs a dictionary lookup instead of an RSA signature check.
+"""
+import base64
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+
+from authlib.jose import JsonWebKey, JsonWebToken
+from authlib.jose.errors import JoseError
+
+logger = logging.getLogger(__name__)
+
+
+class AuthError(Exception):
+    """ a missing, malformed or invalid bearer token """
+
+
+def fetch_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def auth0_jwks(metadata_url):
+    """ JWKS loader reading ``jwks_uri`` from the OpenID Connect metadata """
+    def fetch():
+        return fetch_json(fetch_json(metadata_url)['jwks_uri'])
+    return fetch
+
+
+class JWKSCache:
+    """ signing keys by ``kid``, loaded by ``fetch`` and kept fresh """
+
+    def __init__(self, fetch, refresh_interval=3600, min_refresh_interval=30):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        """ reload the key set, keeping the previous keys if the fetch fails """
+        self._refreshed_at = time.monotonic()
+        try:
+            key_set = JsonWebKey.import_key_set(self.fetch())
+        except Exception as e:
+            logger.warning("Could not refresh the JWKS: %s", e)
+            return False
+        self._keys = {key.kid: key for key in key_set.keys}
+        return True
+
+    def get(self, kid):
+        """ key for ``kid``, fetching the key set again when it is not known """
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._lock:
+            key = self._keys.get(kid)
+            recently = self._refreshed_at is not None and \
+                time.monotonic() - self._refreshed_at < self.min_refresh_interval
+            # an unknown kid may be a rotated key, but never let bogus tokens hammer Auth0
+            if key is None and not recently:
+                self.refresh()
+                key = self._keys.get(kid)
+            self.start()
+        return key
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self):
+        """ refresh in a background thread, started on first use so forked workers each get one """
+        if self._thread is None and self.refresh_interval:
+            self._thread = threading.Thread(target=self._run, name='jwks-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _header(token):
+    try:
+        segment = token.split('.', 1)[0]
+        header = json.loads(base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)))
+    except (ValueError, TypeError):
+        raise AuthError("Malformed token")
+    # a kid that is not a string cannot name a key (and a list or object is not even hashable)
+    if not isinstance(header, dict) or not isinstance(header.get('kid'), str):
+        raise AuthError("Malformed token")
+    return header
+
+
+class TokenVerifier:
+    """ checks signature, issuer, audience and expiry of bearer tokens """
+
+    def __init__(self, jwks, issuer, audience, algorithms=('RS256',), leeway=60, cache_size=1024):
+        # authlib skips a claim check whose expected value is None, which would accept any audience
+        if not issuer or not audience:
+            raise ValueError("TokenVerifier needs an issuer and an audience")
+        self.jwks = jwks
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self._jwt = JsonWebToken(list(algorithms))
+        self._claims_options = {
+            'iss': {'essential': True, 'value': issuer},
+            'aud': {'essential': True, 'value': audience},
+            'exp': {'essential': True},
+        }
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token):
+        """ the token's claims, raises AuthError """
+        now = time.time()
+        with self._lock:
+            entry = self._verified.get(token)
+            if entry is not None:
+                claims, expires = entry
+                if now < expires:
+                    self._verified.move_to_end(token)
+                    return claims
+                del self._verified[token]
+
+        key = self.jwks.get(_header(token).get('kid'))
+        if key is None:
+            raise AuthError("Unknown signing key")
+        try:
+            claims = self._jwt.decode(token, key, claims_options=self._claims_options)
+            claims.validate(now=now, leeway=self.leeway)
+        except JoseError as e:
+            raise AuthError(f"Invalid token: {e.error}")
+        except ValueError:
+            raise AuthError("Malformed token")
+
+        claims = dict(claims)
+        with self._lock:
+            self._verified[token] = (claims, claims['exp'] + self.leeway)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+
+def bearer_token(header):
+    """ the token of an ``Authorization: Bearer`` header, None without one """
+    if not header:
+        return None
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        raise AuthError("Expected a Bearer token")
+    return token.strip()